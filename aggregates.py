@@ -0,0 +1,153 @@
+import math
+import os
+
+from journal_cache import JournalCache, main, payload_version
+
+
+def to_number(value):
+    """Parse a stored answer as a float, or return None for blank/free-text answers."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _empty_child():
+    return {"entries": 0, "first_date": None, "last_date": None, "questions": {}}
+
+
+def _apply(child_stats, values, sign):
+    """Add (sign=1) or retract (sign=-1) one entry's numeric answers."""
+    for qid, value in values.items():
+        number = to_number(value)
+        if number is None:
+            continue
+        stats = child_stats["questions"].setdefault(
+            qid, {"count": 0, "sum": 0.0, "sumsq": 0.0}
+        )
+        stats["count"] += sign
+        stats["sum"] += sign * number
+        stats["sumsq"] += sign * number * number
+        if stats["count"] == 0:
+            del child_stats["questions"][qid]
+
+
+def _record(cache, child_name, timestamp, previous, current):
+    child_stats = cache.setdefault(child_name, _empty_child())
+    if previous is None:
+        child_stats["entries"] += 1
+        date = timestamp[:10]  # "YYYY-MM-DD" sorts chronologically
+        if child_stats["first_date"] is None or date < child_stats["first_date"]:
+            child_stats["first_date"] = date
+        if child_stats["last_date"] is None or date > child_stats["last_date"]:
+            child_stats["last_date"] = date
+    else:
+        _apply(child_stats, previous, -1)
+    _apply(child_stats, current, 1)
+
+
+class AggregateCache(JournalCache):
+    """Running count/sum/sum-of-squares per child and question, plus the date range.
+
+    Also counts entries. Updated on every save so the dashboard overview never
+    has to read the journal.
+    """
+
+    name = "aggregate cache"
+
+    def fold(self, cache, child_name, timestamp, previous, current):
+        _record(cache, child_name, timestamp, previous, current)
+
+    def diff(self, cached, expected):
+        problems = []
+        for child_name in sorted(set(cached) | set(expected)):
+            have, want = (
+                cached.get(child_name, _empty_child()),
+                expected.get(child_name, _empty_child()),
+            )
+            for field in ("entries", "first_date", "last_date"):
+                if have[field] != want[field]:
+                    problems.append(
+                        f"{child_name}: {field} is {have[field]}, "
+                        f"expected {want[field]}"
+                    )
+            for qid in sorted(set(have["questions"]) | set(want["questions"])):
+                got, exp = (
+                    have["questions"].get(qid, {}),
+                    want["questions"].get(qid, {}),
+                )
+                for field in ("count", "sum", "sumsq"):
+                    if not math.isclose(
+                        got.get(field, 0), exp.get(field, 0), rel_tol=1e-9, abs_tol=1e-6
+                    ):
+                        problems.append(
+                            f"{child_name}/{qid}: {field} is {got.get(field, 0)}, "
+                            f"expected {exp.get(field, 0)}"
+                        )
+        return problems
+
+    def child_stats(self, child_name):
+        """The running numbers for one child, or None before its first entry."""
+        return self.get().get(child_name)
+
+    def modified_at(self, _child_name):
+        """When the file with `child_name`'s numbers was last written, or None."""
+        try:
+            return os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return None
+
+    def summary(self, child_name, catalog, registry):
+        """Overview numbers for one child, shaped for the dashboard template.
+
+        Only questions whose response type is numeric are averaged; a free-text
+        answer that happens to parse as a number is not a score.
+        """
+        child_stats = self.get().get(child_name)
+        if not child_stats or not child_stats["entries"]:
+            return {
+                "num_entries": 0,
+                "date_range": ["N/A", "N/A"],
+                "average_scores": {},
+            }
+        average_scores = {
+            catalog.get(qid, qid): round(stats["sum"] / stats["count"], 2)
+            for qid, stats in child_stats["questions"].items()
+            if qid not in catalog or registry.get(catalog[qid]).is_numeric
+        }
+        return {
+            "num_entries": child_stats["entries"],
+            "date_range": [
+                _short_date(child_stats["first_date"]),
+                _short_date(child_stats["last_date"]),
+            ],
+            "average_scores": average_scores,
+        }
+
+    def data_version(self, child_name, qid=None):
+        """Short hash that changes with the child's data (or one question's data)."""
+        child_stats = self.get().get(child_name, _empty_child())
+        if qid is not None:
+            child_stats = {
+                "entries": child_stats["entries"],
+                "last_date": child_stats["last_date"],
+                "question": child_stats["questions"].get(qid),
+            }
+        return payload_version(child_stats)
+
+
+def _short_date(date):
+    """Format "YYYY-MM-DD" as "MM/DD/YY" for the overview."""
+    year, month, day = date.split("-")
+    return f"{month}/{day}/{year[2:]}"
+
+
+if __name__ == "__main__":
+    # Cache maintenance:
+    #   python aggregates.py verify   - compare the cache with the raw journal
+    #   python aggregates.py repair   - rebuild the children it is behind on
+    #   python aggregates.py rebuild  - recompute it from scratch
+    from app import aggregates, journal
+
+    main(aggregates, journal)
@@ -1,175 +1,363 @@
-from flask import Flask, render_template, request, redirect, url_for
-import csv
-from datetime import datetime
-import os
-import pandas as pd
-import matplotlib.pyplot as plt
+import hashlib
+import io
 import json
+import math
+import os
+import time
+import unicodedata
+from datetime import date, datetime
+from functools import partial
+from urllib.parse import quote
+
+from flask import (
+    Flask,
+    Response,
+    before_render_template,
+    g,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    template_rendered,
+    url_for,
+)
+
+from aggregates import AggregateCache
+from bulk_import import BulkImporter, read_records
+from chart_cache import ChartCache, sanitize_filename
+from config_store import ConfigStore
+from correlations import CorrelationCache, mask_weak
+from file_utils import JsonFile, file_lock, write_json_atomic
+from jobs import JobQueue
+from journal_cache import payload_version
+from journal_store import JournalStore, csv_lines
+from metrics import REQUEST_SECONDS, STAGE_SECONDS, debug, render_metrics, timed
+from questions import (
+    PREDEFINED_QUESTIONS,
+    RESPONSE_TYPE_LABELS,
+    QuestionRegistry,
+    question_id,
+)
+from rollups import RESOLUTIONS, RollupCache
+from shards import ShardedCache, ShardedConfigStore, ShardedJournalStore
+from sqlite_store import (
+    ConnectionPool,
+    SqliteConfigStore,
+    SqliteJournalStore,
+    create_schema,
+)
+from trends import TrendCache
 
 app = Flask(__name__, static_folder="static")
 
 # File to store selected questions for each child
 CHILD_QUESTIONS_FILE = "child_questions.json"
 
-# Ensure the file exists (creates an empty JSON if it doesn't exist)
-if not os.path.exists(CHILD_QUESTIONS_FILE):
-    with open(CHILD_QUESTIONS_FILE, "w") as f:
-        json.dump({}, f)
-
-# Predefined question groups and their questions
-PREDEFINED_QUESTIONS = {
-    "Behavior and Emotions": [
-        "On a scale of 1–5, how stable was your child’s mood today?",
-        "How many emotional outbursts did your child have today?",
-        "How many meltdowns occurred today?",
-        "How many instances of aggression occurred today?",
-        "How many minutes did the longest meltdown last?",
-        "On a scale of 1–5, how intense was the most severe meltdown?",
-        "How many times did your child direct aggression toward others?",
-        "How many times did your child direct aggression toward themselves?"
-    ],
-    "Daily Activities": [
-        "How many hours did your child sleep last night?",
-        "What time did your child wake up?",
-        "What time did your child fall asleep?",
-        "How many naps did your child take today?",
-        "How many minutes did your child nap today?",
-        "On a scale of 1–5, how well did your child eat today?",
-        "How many meals/snacks did your child eat today?",
-        "How many new foods did your child try today?",
-        "How many minutes/hours did your child spend on screens today?",
-        "How many minutes of physical activity did your child get today?",
-        "On a scale of 1–5, how engaged was your child in physical activities?"
-    ],
-    "Sensory Concerns": [
-        "How many sensory-related behaviors occurred today?",
-        "How many times did your child react strongly to sensory input today?",
-        "On a scale of 1–5, how sensitive was your child to sensory input today?",
-        "How many times did your child engage in sensory-seeking behaviors today?",
-        "How many minutes did your child spend in sensory play today?",
-        "How many times did your child show sensitivity to touch today?"
-    ],
-    "Cognitive and Academic Performance": [
-        "On a scale of 1–5, how well was your child able to focus on tasks today?",
-        "How many times did your child lose focus during structured activities?",
-        "How many minutes of focused activity was your child able to sustain at one time?",
-        "How many tasks did your child complete today?",
-        "How many learning-related frustrations did your child express today?",
-        "How many minutes did your child spend on schoolwork or learning activities today?"
-    ],
-    "Health and Medical": [
-        "How many times did your child complain about physical discomfort today?",
-        "How many times did your child wake up during the night?",
-        "How long did it take (in minutes) for your child to fall asleep?",
-        "How many doses of medication were administered today?",
-        "How many side effects were observed today (e.g., drowsiness, appetite loss)?",
-        "How many seizures or unusual movements occurred today?",
-        "On a scale of 1–5, how severe were your child’s symptoms today?"
-    ],
-    "Parent and Caregiver Observations": [
-        "On a scale of 1–5, how stressed did you feel today while caring for your child?",
-        "How many minutes did you spend on self-care today?",
-        "How many positive interactions did you have with your child today (e.g., hugs, playing together)?",
-        "What was the most challenging part of caring for your child today?",
-        "What was the most positive part of your child’s day today?"
-    ]
-}
-
 # File to store the journal entries
+# Legacy wide format, now produced on demand by the exporter
 CSV_FILE = "child_journal.csv"
+# Long format: one row per (entry, question, value)
+JOURNAL_FILE = "child_journal_entries.csv"
+QUESTION_CATALOG_FILE = "journal_questions.json"
+# Response types chosen for custom questions: question_id -> response type
+QUESTION_TYPES_FILE = "question_types.json"
+
+# JOURNAL_BACKEND=sqlite keeps children, selections and answers in one WAL-mode database
+# instead; JOURNAL_BACKEND=sharded gives every child its own journal, question list and
+# caches under SHARD_DIR
+JOURNAL_BACKEND = os.environ.get("JOURNAL_BACKEND", "csv")
+DATABASE_FILE = os.environ.get("DATABASE_FILE", "child_journal.db")
+SHARD_DIR = os.environ.get("SHARD_DIR", "journal_shards")
+SHARD_CACHE_FILES = (
+    (AggregateCache, "aggregates.json"),
+    (CorrelationCache, "correlations.json"),
+    (RollupCache, "rollups.json"),
+    (TrendCache, "trends.json"),
+)
+
+if JOURNAL_BACKEND == "sqlite":
+    pool = ConnectionPool(DATABASE_FILE)
+    create_schema(pool)
+    config = SqliteConfigStore(pool)
+    journal = SqliteJournalStore(pool)
+elif JOURNAL_BACKEND == "sharded":
+    # Split from the combined files with `python shards.py split`
+    config = ShardedConfigStore(SHARD_DIR)
+    journal = ShardedJournalStore(SHARD_DIR, QUESTION_CATALOG_FILE)
+else:
+    # Ensure the file exists (creates an empty JSON if it doesn't exist)
+    if not os.path.exists(CHILD_QUESTIONS_FILE):
+        write_json_atomic(CHILD_QUESTIONS_FILE, {})
+
+    # Parsed once and re-read only when another worker changes the file
+    config = ConfigStore(CHILD_QUESTIONS_FILE)
+    journal = JournalStore(JOURNAL_FILE, QUESTION_CATALOG_FILE)
+
+# Question ids, categories and response types, computed once per process
+question_types = JsonFile(QUESTION_TYPES_FILE)
+registry = QuestionRegistry(custom_types=question_types)
+app.jinja_env.globals["response_type"] = lambda question: (
+    registry.get(question).response_type
+)
+
+# Running per-child aggregates for the dashboard overview
+AGGREGATES_FILE = "journal_aggregates.json"
+aggregates = AggregateCache(AGGREGATES_FILE)
+
+# Running pairwise co-moments per child for the correlation heat map
+CORRELATIONS_FILE = "journal_correlations.json"
+correlations = CorrelationCache(CORRELATIONS_FILE)
+
+# Daily/weekly/monthly buckets per child and question for the dashboard charts. Every
+# save rewrites them, and they grow with each child's history, so each child has its own
+# file: a worker only re-parses the rollups of a child whose data changed.
+ROLLUPS_DIR = "journal_rollups"
+rollups = ShardedCache(RollupCache, ROLLUPS_DIR, "rollups.json")
+
+# Rolling EWMAs and z-scores per child and question for the
+# overview's unusual-answer flags
+TRENDS_FILE = "journal_trends.json"
+trends = TrendCache(TRENDS_FILE)
+
+if JOURNAL_BACKEND == "sharded":
+    # One file per child, so folding in a save only rewrites that child's numbers
+    aggregates, correlations, rollups, trends = (
+        ShardedCache(cache_class, SHARD_DIR, filename)
+        for cache_class, filename in SHARD_CACHE_FILES
+    )
+DEFAULT_CHART_WIDTH = 800  # pixels, when the browser doesn't say
+PNG_CHART_WIDTH = 1000  # the 10-inch matplotlib figure at 100 dpi
+
+# Cache folds and chart renders run here, off the request path
+jobs = JobQueue()
+
+# Rendered dashboard charts, keyed by each chart's data version
+CHART_CACHE_DIR = "static/charts"
+chart_cache = ChartCache(CHART_CACHE_DIR)
+
+# Parquet snapshot of the journal for analysis outside the app, rebuilt by
+# `python snapshots.py`. The dashboards read the rollup and correlation caches
+# instead, which replaced the snapshot reader.
+SNAPSHOT_DIR = "journal_snapshot"
 
 
 def initialize_csv():
-    """Ensure the CSV file exists and add missing headers dynamically."""
-    # Default headers
-    headers = ["Date/Time", "Child Name"]
-
-    # Load child-specific questions from the JSON file
-    if os.path.exists(CHILD_QUESTIONS_FILE):
-        with open(CHILD_QUESTIONS_FILE, "r") as f:
-            child_questions = json.load(f)
-            # Add all unique questions from all children
-            for child, questions in child_questions.items():
-                headers.extend(questions)
-            headers = list(set(headers))  # Remove duplicates and maintain unique headers
-
-    if os.path.exists(CSV_FILE):
-        # Read existing headers
-        with open(CSV_FILE, mode="r", newline="") as file:
-            reader = csv.reader(file)
-            rows = list(reader)  # Save existing rows
-            existing_headers = rows[0] if rows else []
-
-        # Add missing headers
-        for header in headers:
-            if header not in existing_headers:
-                existing_headers.append(header)
-
-        # Rewrite the CSV with updated headers
-        with open(CSV_FILE, mode="w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(existing_headers)  # Write updated headers
-            writer.writerows(rows[1:])  # Write back existing rows, skipping the old header
-    else:
-        # Create a new file with the correct headers
-        with open(CSV_FILE, mode="w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(headers)
+    """Migrate the legacy wide CSV if needed and register every selected question."""
+    # One-off import of the old wide file; the lock keeps concurrent workers from
+    # both importing it
+    with file_lock(CSV_FILE):
+        if not journal.exists() and os.path.exists(CSV_FILE):
+            journal.import_wide(CSV_FILE)
+        if JOURNAL_BACKEND == "sharded":
+            for cache in (aggregates, correlations, rollups, trends):
+                cache.rebuild(journal, missing_only=True)
+        else:
+            if not os.path.exists(AGGREGATES_FILE):
+                aggregates.rebuild(journal)
+            if not os.path.exists(CORRELATIONS_FILE):
+                correlations.rebuild(journal)
+            if not os.path.isdir(ROLLUPS_DIR):
+                rollups.rebuild(journal)
+            if not os.path.exists(TRENDS_FILE):
+                trends.rebuild(journal)
+
+    # Add all questions from all children, keeping their first-seen order
+    questions = []
+    for child_question_list in config.get().values():
+        questions.extend(q for q in child_question_list if q.strip())
+
+    # Adding a question is metadata-only; journal history is never rewritten
+    journal.catalog.register(list(dict.fromkeys(questions)))
+
 
 def save_to_csv(child_name, responses):
     """Save the responses to a CSV file without overwriting existing data."""
-    initialize_csv()  # Ensure headers are up-to-date
-
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    # Load child-specific questions from JSON
-    with open(CHILD_QUESTIONS_FILE, "r") as f:
-        child_questions = json.load(f)
-    questions = child_questions.get(child_name, [])
-
-    # Load existing data
-    updated = False
-    rows = []
-    with open(CSV_FILE, mode="r", newline="") as file:
-        reader = csv.DictReader(file)
-        headers = reader.fieldnames
-        for row in reader:
-            # Update the current child's entry if it matches the timestamp
-            if row["Child Name"] == child_name and row["Date/Time"] == now:
-                for i, question in enumerate(questions):
-                    row[question] = responses[i] if i < len(responses) else row.get(question)
-                updated = True
-            rows.append(row)
-
-    # If not updated, add a new row
-    if not updated:
-        new_row = {header: "" for header in headers}
-        new_row["Date/Time"] = now
-        new_row["Child Name"] = child_name
-        for i, question in enumerate(questions):
-            new_row[question] = responses[i] if i < len(responses) else ""
-        rows.append(new_row)
-
-    # Write updated data back to the file
-    with open(CSV_FILE, mode="w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=headers)
-        writer.writeheader()
-        writer.writerows(rows)
+    questions = config.questions(child_name)
+
+    # Append the entry; an entry with the same timestamp is merged and superseded
+    values = {
+        question: responses[i]
+        for i, question in enumerate(questions)
+        if i < len(responses)
+    }
+    save_entries([(child_name, now, values)])
+
+
+def refresh_caches(saved):
+    """Fold saves into the running caches (a background job).
+
+    Each save is `(child_name, timestamp, previous, current, sequence)`.
+    """
+    aggregates.record_many(saved, journal)
+    correlations.record_many(saved, journal)
+    rollups.record_many(saved, journal)
+    trends.record_many(saved, journal)
+
+
+def repair_caches(_items):
+    """Rebuild children whose cached numbers missed saves (a background job).
+
+    Folds can be lost with a killed worker.
+    """
+    for cache in (aggregates, correlations, rollups, trends):
+        repaired = cache.repair(journal)
+        if repaired:
+            print(f"Repaired the {cache.name} for {', '.join(repaired)}")
+
+
+def compact_journal(_items):
+    """Drop superseded revisions from the journal (a background job)."""
+    journal.compact()
+
+
+# Edits append a new revision of the entry, so the journal is compacted in the
+# background once a process has superseded this many revisions. Revisions left
+# by earlier processes wait for the next run, or for `python journal_store.py
+# compact` from cron.
+COMPACT_AFTER = int(os.environ.get("JOURNAL_COMPACT_AFTER", 500))
+_superseded = 0  # revisions superseded by this process since its last compaction
+
+_repair_queued_in = None  # pid of the process that queued its startup repair
+
+
+@app.before_request
+def queue_cache_repair():
+    # Once per worker process, on its first request rather than at import, so
+    # maintenance scripts that import the app see the caches as they are
+    global _repair_queued_in
+    if _repair_queued_in != os.getpid():
+        _repair_queued_in = os.getpid()
+        jobs.submit("caches:repair", repair_caches)
+
+
+def save_entries(entries):
+    """Save (child_name, timestamp, {question: value}) entries in one journal write.
+
+    The journal write is synchronous; the cache updates are queued per child,
+    so the request returns at once and a burst of saves is folded in together.
+    """
+    results = journal.save_many(entries)
+    by_child = {}
+    for (child_name, timestamp, _), (previous, current, sequence) in zip(
+        entries, results, strict=True
+    ):
+        by_child.setdefault(child_name, []).append(
+            (child_name, timestamp, previous, current, sequence)
+        )
+    for child_name, saved in by_child.items():
+        jobs.submit(f"caches:{child_name}", refresh_caches, saved)
+
+    global _superseded
+    _superseded += sum(previous is not None for previous, _, _ in results)
+    if _superseded >= COMPACT_AFTER:
+        _superseded = 0
+        jobs.submit("journal:compact", compact_journal)
+
+
+def render_charts(tasks):
+    """Render queued `(stage, path, function, args)` chart tasks (a background job).
+
+    Charts drawn since they were queued are skipped. Charts that fail are
+    remembered, so the dashboard stops queueing them,
+    and the job itself is marked failed.
+    """
+    from chart_renderer import render_all
+
+    # A merged job can hold the same chart several times, and another job may have
+    # drawn it since
+    unique = {
+        path: (stage, path, function, args) for stage, path, function, args in tasks
+    }
+    tasks = [
+        ((stage, path), function, args)
+        for stage, path, function, args in unique.values()
+        if not chart_cache.lookup(path)
+    ]
+    failed = []
+    for (stage, path), error, seconds in render_all(tasks):
+        if error is None:
+            STAGE_SECONDS.observe(stage, seconds)
+            debug("Generated chart: %s", path)
+        else:
+            print(f"Error generating chart {path}: {error}")
+            chart_cache.mark_failed(path)
+            failed.append(path)
+    # Keep the cache bounded; superseded versions age out first
+    if tasks:
+        chart_cache.evict()
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} of {len(tasks)} charts could not be drawn: "
+            f"{', '.join(failed)}"
+        )
+
+
+def freshness(child_name):
+    """When the dashboard caches were last written, and whether an update is queued."""
+    modified = aggregates.modified_at(child_name)
+    updated = (
+        datetime.fromtimestamp(modified).strftime("%Y-%m-%d %H:%M:%S")
+        if modified
+        else None
+    )
+    return {"updated_at": updated, "pending": jobs.busy(f"caches:{child_name}")}
+
+
+# Request and template timings for /metrics
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_time(response):
+    # Streamed responses are timed to their first byte; the body is sent after this hook
+    started = g.pop("request_started", None)
+    if started is not None:
+        REQUEST_SECONDS.observe(
+            request.endpoint or "unmatched", time.perf_counter() - started
+        )
+    return response
+
+
+def _start_template_timer(_sender, **_extra):
+    g.template_started = time.perf_counter()
+
+
+def _record_template_time(_sender, **_extra):
+    started = g.pop("template_started", None)
+    if started is not None:
+        STAGE_SECONDS.observe("template_render", time.perf_counter() - started)
+
+
+before_render_template.connect(_start_template_timer, app)
+template_rendered.connect(_record_template_time, app)
+
+
+@app.route('/metrics')
+def show_metrics():
+    """Request and stage latency histograms in the Prometheus text format."""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/jobs')
+def job_status():
+    """Queued, running and recently finished background jobs in this worker process."""
+    return jsonify(jobs.status())
+
 
 def get_existing_children():
     """Get all child names from child_questions.json."""
-    if not os.path.exists(CHILD_QUESTIONS_FILE):
-        return []
-    with open(CHILD_QUESTIONS_FILE, "r") as f:
-        child_questions = json.load(f)
-    return sorted(child_questions.keys())
+    return config.children()
 
 @app.route('/data_entry', methods=["GET", "POST"])
 def data_entry():
     """Display the form for entering daily responses."""
     # Get the list of all children
     children = get_existing_children()
-    print(f"Children: {children}")  # Debugging
+    debug("Children: %s", children)
 
     # Determine the selected child
     if request.method == "POST":
@@ -178,15 +366,13 @@ def data_entry():
     else:
         # Get the selected child from query parameters or default to the first child
         selected_child = request.args.get("child", children[0] if children else "")
-    print(f"Selected child: {selected_child}")  # Debugging
+    debug("Selected child: %s", selected_child)
 
-    # Load the child-specific questions from the JSON file
+    # Load the child-specific questions from the config store
     questions = []
     if selected_child:
-        with open(CHILD_QUESTIONS_FILE, "r") as f:
-            child_questions = json.load(f)
-        questions = child_questions.get(selected_child, [])
-        print(f"Questions for {selected_child}: {questions}")  # Debugging
+        questions = config.questions(selected_child)
+        debug("Questions for %s: %s", selected_child, questions)
 
     return render_template(
         "data_entry.html",
@@ -206,20 +392,15 @@ def submit():
         child_name = request.form.get("child_name", "").strip()
 
         if action_type == "submit_data":
+            # Only children added on the setup page can have entries
+            if child_name not in config.children():
+                return f"Unknown child '{child_name}'.", 404
+
             # Handle data submission
-            with open(CHILD_QUESTIONS_FILE, "r") as f:
-                child_questions = json.load(f)
-            questions = child_questions.get(child_name, [])
-
-            # Process responses
-            responses = []
-            for i, question in enumerate(questions):
-                response = request.form.get(f"q{i}", "").strip()
-                if question.lower().startswith("did"):
-                    response = int(response) if response in ["1", "0"] else None
-                elif question.lower().startswith("on a scale of 1–5"):
-                    response = int(response) if response.isdigit() and 1 <= int(response) <= 5 else None
-                responses.append(response)
+            questions = config.questions(child_name)
+
+            # Process responses with each question's precompiled validator
+            responses = registry.parse_responses(questions, request.form)
 
             # Save the responses
             save_to_csv(child_name, responses)
@@ -230,16 +411,12 @@ def submit():
         # For "change_child", no data submission, no success message
         # Just update selected_child and reload questions
         selected_child = child_name
-        with open(CHILD_QUESTIONS_FILE, "r") as f:
-            child_questions = json.load(f)
-        questions = child_questions.get(selected_child, [])
+        questions = config.questions(selected_child)
     else:
         # Handle GET request
         children = get_existing_children()
         selected_child = children[0] if children else None
-        with open(CHILD_QUESTIONS_FILE, "r") as f:
-            child_questions = json.load(f)
-        questions = child_questions.get(selected_child, [])
+        questions = config.questions(selected_child)
 
     # Reload the form (GET or POST)
     children = get_existing_children()
@@ -259,247 +436,318 @@ def dashboard_overview():
     if not children:
         return "No children available. Please add a child first."
 
-    # Initialize children_data dictionary
-    children_data = {}
-
-    # Read the CSV file
-    if os.path.exists(CSV_FILE):
-        df = pd.read_csv(CSV_FILE)
-        df["Date/Time"] = pd.to_datetime(df["Date/Time"], errors="coerce")
-        df["Date"] = df["Date/Time"].dt.date  # Extract just the date
-
-        for child in children:
-            child_data = df[df["Child Name"] == child]
-            if not child_data.empty:
-                num_entries = len(child_data)
-                date_range = [
-                    child_data["Date"].min().strftime("%m/%d/%y"),
-                    child_data["Date"].max().strftime("%m/%d/%y"),
-                ]
-                average_scores = child_data.mean(numeric_only=True).dropna().round(2).to_dict()
-                children_data[child] = {
-                    "num_entries": num_entries,
-                    "date_range": date_range,
-                    "average_scores": average_scores,
-                }
-            else:
-                children_data[child] = {
-                    "num_entries": 0,
-                    "date_range": ["N/A", "N/A"],
-                    "average_scores": {},
-                }
+    # Served from the running aggregates, so the journal is never read here
+    catalog = journal.catalog.get()
+    children_data = {
+        child: aggregates.summary(child, catalog, registry) for child in children
+    }
+    for child in children:
+        children_data[child]["flags"] = trends.flags(child, catalog, registry)
 
     return render_template("dashboard_overview.html", children_data=children_data)
 
 
-@app.route('/dashboard/<child_name>')
-def child_dashboard(child_name):
-    """Child-specific dashboard showing charts based on selected questions."""
-    # Clear the static folder before generating new charts
-    clear_static_folder()
-
-    print(f"Dashboard for child: {child_name}")
-    if not os.path.exists(CSV_FILE):
-        return "No data available to visualize."
+def chart_questions(child_name, child_stats):
+    """The child's selected numeric questions that have answers in the aggregates."""
+    questions = config.questions(child_name)
+    debug("Selected Questions: %s", questions)
+    return [
+        q
+        for q in questions
+        if q.strip()
+        and registry.get(q).is_numeric
+        and question_id(q) in child_stats["questions"]
+    ]
 
-    # Read the CSV file
-    try:
-        df = pd.read_csv(CSV_FILE)
-        print("CSV Data:\n", df.head())  # Debug: Show the first few rows of the CSV
-    except Exception as e:
-        print(f"Error reading CSV: {e}")
-        return f"Error reading CSV: {e}"
 
-    # Ensure datetime conversion
+def _iso_date(value):
+    """Normalize a "YYYY-MM-DD" query value, or None if it is missing or invalid."""
     try:
-        df["Date/Time"] = pd.to_datetime(df["Date/Time"], errors="coerce")
-        df["Date"] = df["Date/Time"].dt.date
-        print("Parsed Date/Time Column:\n", df["Date/Time"])  # Debug: Show parsed dates
-    except Exception as e:
-        print(f"Error parsing dates: {e}")
-        return f"Error parsing dates: {e}"
+        return date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        return None
 
-    # Filter by child name
-    df["Child Name"] = df["Child Name"].str.strip()
-    filtered_df = df[df["Child Name"] == child_name]
-    print(f"Filtered Data for {child_name}:\n", filtered_df)  # Debug: Show filtered data
 
-    if filtered_df.empty:
-        return render_template("child_dashboard.html", child_name=child_name, charts=[])
+def chart_view(child_name, questions, width):
+    """Date range and rollup resolution from the dashboard's query string selector.
 
-    # Dynamically find questions for the child
-    with open(CHILD_QUESTIONS_FILE, "r") as f:
-        child_questions = json.load(f)
+    With resolution "auto" (the default) the finest rollup that fits `width`
+    pixels over the range is used, so long histories stay bounded.
+    """
+    start, end = (
+        _iso_date(request.args.get("start")),
+        _iso_date(request.args.get("end")),
+    )
+    resolution = request.args.get("resolution", "auto")
+    if resolution not in RESOLUTIONS:
+        qids = [question_id(q) for q in questions]
+        resolution = rollups.choose_resolution(child_name, qids, width, start, end)
+    return start, end, resolution
 
-    questions = child_questions.get(child_name, [])
-    print("Selected Questions:", questions)  # Debug: Show questions for the child
 
-    # Filter out empty or invalid questions
-    questions = [q for q in questions if q.strip() and q in filtered_df.columns and pd.api.types.is_numeric_dtype(filtered_df[q])]
+@app.route('/dashboard/<child_name>')
+def child_dashboard(child_name):
+    """Child-specific dashboard showing charts based on selected questions."""
+    debug("Dashboard for child: %s", child_name)
+    if not journal.exists():
+        return "No data available to visualize."
 
-    # Generate line charts for numeric columns
+    view = {
+        "start": _iso_date(request.args.get("start")),
+        "end": _iso_date(request.args.get("end")),
+        "resolution": request.args.get("resolution", "auto"),
+    }
+
+    # Charts are drawn in the browser from the series API unless server-rendered PNGs
+    # are asked for
+    if request.args.get("render") != "png":
+        return render_template(
+            "child_dashboard.html",
+            child_name=child_name,
+            view=view,
+            resolutions=RESOLUTIONS,
+            series_url=url_for("child_series", child_name=child_name, **view),
+        )
+
+    child_stats = aggregates.child_stats(child_name)
+    if not child_stats or not child_stats["entries"]:
+        return render_template(
+            "child_dashboard.html",
+            child_name=child_name,
+            view=view,
+            resolutions=RESOLUTIONS,
+            charts=[],
+        )
+
+    # matplotlib is only loaded by the first server-rendered dashboard, not
+    # at worker startup
+    from chart_renderer import render_heatmap, render_line_chart
+
+    questions = chart_questions(child_name, child_stats)
+    start, end, resolution = chart_view(child_name, questions, PNG_CHART_WIDTH)
+    view_key = f"{resolution}_{start or ''}_{end or ''}"
+
+    # Charts are cached per version of the data they plot, which comes from the same
+    # cache, so a chart never outlives its data however far the caches' folds are apart.
+    # A chart whose data changed is queued for rendering and the page shows its newest
+    # earlier render (if any) meanwhile.
     charts = []
-    import re
-
-    def sanitize_filename(filename):
-        """Sanitize a filename by removing special characters."""
-        filename = re.sub(r'[^\w\s]', '', filename)  # Remove all non-alphanumeric and non-space characters
-        filename = re.sub(r'\s+', '_', filename)    # Replace spaces with underscores
-        return filename
-
+    tasks = []
     for question in questions:
-        # Generate the sanitized chart file path
-        sanitized_question = sanitize_filename(question)
-        chart_path = f"static/{child_name}_{sanitized_question}_chart.png"
-        try:
-            grouped_data = filtered_df.groupby("Date")[question].mean()
-            grouped_data.plot(kind="line", title=question, figsize=(10, 6), marker="o")
-
-            plt.xlabel("Date")
-            plt.ylabel("Average")
-            plt.xticks(rotation=45)
-
-            # Limit x-axis labels to reduce overcrowding
-            num_labels = 10  # Adjust this number as needed
-            if len(grouped_data) > num_labels:
-                step = max(1, len(grouped_data) // num_labels)
-                plt.gca().set_xticks(grouped_data.index[::step])
-
-            plt.tight_layout()
-            plt.savefig(chart_path)
-            plt.close()
-            charts.append({"title": question, "path": chart_path})
-            print(f"Generated chart for {question}: {chart_path}")
-        except Exception as e:
-            print(f"Error generating chart for {question}: {e}")
-
-    # Generate correlation heat map
-    numeric_columns = filtered_df.select_dtypes(include=['number'])
-    if not numeric_columns.empty:
-        correlation_matrix = numeric_columns.corr()
-        heatmap_path = f"static/{child_name}_heatmap.png"
-        try:
-            import seaborn as sns
-            plt.figure(figsize=(12, 10))
-
-            # Filter low correlations
-            threshold = 0.3
-            filtered_corr = correlation_matrix.mask(correlation_matrix.abs() < threshold)
- 
-            # Shorten labels
-            max_label_length = 15
-            short_labels = {
-                col: (col[:max_label_length] + "...") if len(col) > max_label_length else col
-                for col in correlation_matrix.columns
-            }
-            filtered_corr.rename(columns=short_labels, index=short_labels, inplace=True)
-
-            # Drop insignificant rows/columns
-            filtered_corr = filtered_corr.dropna(how="all", axis=0).dropna(how="all", axis=1)
-        
-            correlation_matrix.rename(columns=short_labels, index=short_labels, inplace=True)
-            print("Generating heat map...")
-            sns.heatmap(
-                filtered_corr,
-                annot=True,                # Display correlation values
-                fmt=".2f",                 # Limit decimal places
-                cmap="coolwarm",           # Use a perceptually uniform colormap
-                cbar=True,                 # Display color bar
-                annot_kws={"size": 10},    # Annotation font size
+        # Plot the pre-aggregated buckets; the journal is never read here
+        with timed("rollup_series"):
+            series = rollups.series(
+                child_name, question_id(question), resolution, start, end
             )
-            print("Heat map generated. Saving chart...")
-            plt.title(f"Correlation Heatmap for {child_name}", fontsize=16)
-            plt.xticks(rotation=45, ha="right", fontsize=10)  # Rotate x-axis labels
-            plt.yticks(rotation=0, fontsize=10)              # Keep y-axis labels horizontal
-            plt.tight_layout()
-            plt.savefig(heatmap_path)
-            print(f"Heat map saved at: {chart_path}")
-            plt.close()
-        except Exception as e:
-            heatmap_path = None
-            print(f"Error generating heatmap: {e}")
+        chart_path = chart_cache.path_for(
+            child_name, question, payload_version(series), view=view_key
+        )
+        if chart_cache.lookup(chart_path):
+            charts.append({"title": question, "path": chart_path, "stale": False})
+            continue
+        charts.append({
+            "title": question,
+            "path": chart_cache.latest(chart_path),
+            "stale": True,
+            "failed": chart_cache.failed(chart_path),
+        })
+        if charts[-1]["failed"]:
+            # Drawing this data already failed; a new save gives it another try
+            continue
+        render = partial(render_line_chart, series["dates"], series["values"], question)
+        tasks.append(
+            ("chart_render", chart_path, chart_cache.store, (chart_path, render))
+        )
+
+    # Correlation heat map from the running co-moments of the child's tracked questions
+    heatmap = None
+    if questions:
+        version = correlations.data_version(
+            child_name, [question_id(q) for q in questions]
+        )
+        heatmap_path = chart_cache.path_for(child_name, "heatmap", version)
+        if chart_cache.lookup(heatmap_path):
+            heatmap = {"path": heatmap_path, "stale": False}
+        else:
+            heatmap = {
+                "path": chart_cache.latest(heatmap_path),
+                "stale": True,
+                "failed": chart_cache.failed(heatmap_path),
+            }
+            with timed("correlation_matrix"):
+                correlation_matrix = correlations.matrix(
+                    child_name, {question_id(q): q for q in questions}
+                )
+            if mask_weak(correlation_matrix).empty:
+                # Nothing strong enough to plot (e.g. a single numeric question);
+                # not worth a render
+                heatmap = {"path": None, "stale": False, "empty": True}
+            elif not heatmap["failed"]:
+                debug("Queueing heat map...")
+                render = partial(render_heatmap, correlation_matrix, child_name)
+                args = (heatmap_path, render)
+                tasks.append(("heatmap_render", heatmap_path, chart_cache.store, args))
+
+    # Stale charts render in the background, one job per child and view however often
+    # the page is reloaded
+    if tasks:
+        jobs.submit(f"charts:{child_name}:{view_key}", render_charts, tasks)
+
+    return render_template(
+        "child_dashboard.html",
+        child_name=child_name,
+        view=view,
+        resolutions=RESOLUTIONS,
+        charts=charts,
+        heatmap=heatmap,
+        freshness=freshness(child_name),
+        refreshing=bool(tasks),
+    )
+
+
+@app.route('/api/children/<child_name>/series')
+def child_series(child_name):
+    """Rolled-up series per chart question and the correlation matrix, as JSON.
+
+    The JSON is compact, for the browser. Accepts the dashboard's
+    start/end/resolution selector plus the chart `width` in pixels.
+    """
+    child_stats = aggregates.child_stats(child_name)
+    if not child_stats or not child_stats["entries"]:
+        return jsonify({
+            "child": child_name,
+            "resolution": None,
+            **freshness(child_name),
+            "series": [],
+            "correlations": None,
+        })
+    questions = chart_questions(child_name, child_stats)
+    width = max(
+        100, min(request.args.get("width", DEFAULT_CHART_WIDTH, type=int), 4000)
+    )
+    start, end, resolution = chart_view(child_name, questions, width)
+
+    # The ETag covers the versions of the rollups and co-moments the body is built
+    # from (each cache is folded and repaired on its own), the chart questions and
+    # the view, so a revalidation is a few hashes
+    status = freshness(child_name)
+    qids = [question_id(q) for q in questions]
+    etag_source = json.dumps([
+        rollups.data_version(child_name, qids, resolution, start, end),
+        correlations.data_version(child_name, qids),
+        questions,
+        start,
+        end,
+        resolution,
+        status,
+    ])
+    etag = hashlib.sha1(etag_source.encode("utf-8")).hexdigest()[:16]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
     else:
-        heatmap_path = None
-
-    return render_template("child_dashboard.html", child_name=child_name, charts=charts, heatmap_path=heatmap_path)
-
-def clear_static_folder():
-    """Delete all files in the static folder."""
-    STATIC_FOLDER = "static"
-    for filename in os.listdir(STATIC_FOLDER):
-        file_path = os.path.join(STATIC_FOLDER, filename)
-        try:
-            if os.path.isfile(file_path):  # Check if it's a file
-                os.unlink(file_path)  # Delete the file
-                print(f"Deleted: {file_path}")
-            elif os.path.isdir(file_path):  # Check if it's a directory (if necessary)
-                os.rmdir(file_path)  # Remove the directory
-                print(f"Deleted directory: {file_path}")
-        except Exception as e:
-            print(f"Failed to delete {file_path}: {e}")
+        with timed("rollup_series"):
+            series = [
+                {
+                    "question": question,
+                    "type": registry.get(question).response_type,
+                    **rollups.series(child_name, qid, resolution, start, end),
+                }
+                for question, qid in zip(questions, qids, strict=True)
+            ]
+        with timed("correlation_matrix"):
+            labels = dict(zip(qids, questions, strict=True))
+            matrix = mask_weak(correlations.matrix(child_name, labels))
+        response = jsonify({
+            "child": child_name,
+            "resolution": resolution,
+            **status,
+            "series": series,
+            "correlations": {
+                "labels": list(matrix.columns),
+                "matrix": [
+                    [None if math.isnan(value) else round(value, 3) for value in row]
+                    for row in matrix.values
+                ],
+            },
+        })
+    response.set_etag(etag)
+    # Always revalidate; a match is a bodyless 304
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 
 @app.route('/')
 def index():
     """Main page to list children and manage questions."""
-    with open(CHILD_QUESTIONS_FILE, "r") as f:
-        child_questions = json.load(f)
-    children = list(child_questions.keys()) if child_questions else []
+    children = list(config.get())
     return render_template("index.html", children=children)
 
 @app.route('/add_child', methods=["POST"])
 def add_child():
     """Add a new child to the system."""
     child_name = request.form.get("child_name").strip()
-    with open(CHILD_QUESTIONS_FILE, "r") as f:
-        child_questions = json.load(f)
-    if child_name not in child_questions:
-        child_questions[child_name] = []
-    with open(CHILD_QUESTIONS_FILE, "w") as f:
-        json.dump(child_questions, f)
+    config.add_child(child_name)
     return redirect(url_for("index"))
 
 @app.route('/select_questions/<child_name>', methods=["GET", "POST"])
 def select_questions(child_name):
     """Question selection interface for a child."""
-    with open(CHILD_QUESTIONS_FILE, "r") as f:
-        child_questions = json.load(f)
-
     if request.method == "POST":
         # Save selected predefined and custom questions
         selected_questions = request.form.getlist("questions")  # Predefined questions
-        updated_custom_questions = request.form.getlist("custom_questions")  # Edited custom questions
-        new_custom_question = request.form.get("new_custom_question")  # New custom question
+        # Edited custom questions
+        updated_custom_questions = request.form.getlist("custom_questions")
+        # New custom question
+        new_custom_question = request.form.get("new_custom_question")
         new_custom_question_checkbox = request.form.get("new_custom_question_checkbox")
 
-        # Add the new custom question only if the checkbox is selected and the input is not empty
+        # Response types picked for the custom questions, by question id
+        chosen_types = {
+            question_id(question): request.form.get(f"type_{question_id(question)}")
+            for question in updated_custom_questions
+        }
+
+        # Add the new custom question only if the checkbox is selected and the input
+        # is not empty
+        new_custom_question = (new_custom_question or "").strip()
         if new_custom_question and new_custom_question_checkbox:
-            updated_custom_questions.append(new_custom_question.strip())
+            if new_custom_question not in updated_custom_questions:
+                updated_custom_questions.append(new_custom_question)
+            chosen_types[question_id(new_custom_question)] = request.form.get(
+                "new_custom_question_type"
+            )
+
+        questions = selected_questions + updated_custom_questions
 
-        child_questions[child_name] = selected_questions + updated_custom_questions
+        # Store only valid types that differ from the ones already stored
+        chosen_types = {
+            qid: response_type
+            for qid, response_type in chosen_types.items()
+            if response_type in RESPONSE_TYPE_LABELS
+            and question_types.get().get(qid) != response_type
+        }
+        if chosen_types:
+            question_types.update(lambda types: types.update(chosen_types))
 
-        # Save to JSON file
-        with open(CHILD_QUESTIONS_FILE, "w") as f:
-            json.dump(child_questions, f)
+        # Save to JSON file (atomic write under the cross-process lock)
+        config.set_questions(child_name, questions)
 
-        # Ensure CSV headers are updated
-        initialize_csv()
+        # Register any new questions in the journal catalog
+        journal.catalog.register([q for q in questions if q.strip()])
 
         return redirect(url_for("index"))
 
     # Separate predefined and custom questions for rendering
-    selected_questions = child_questions.get(child_name, [])
+    selected_questions = config.questions(child_name)
     predefined_questions = {category: [] for category in PREDEFINED_QUESTIONS}
     custom_questions = []
 
     for question in selected_questions:
-        found = False
-        for category, questions in PREDEFINED_QUESTIONS.items():
-            if question in questions:
-                predefined_questions[category].append(question)
-                found = True
-                break
-        if not found:
-            custom_questions.append(question)
+        category = registry.get(question).category
+        if category in predefined_questions:
+            predefined_questions[category].append(question)
+        else:
+            custom_questions.append(registry.get(question))
 
     return render_template(
         "select_questions.html",
@@ -507,10 +755,119 @@ def select_questions(child_name):
         predefined_questions=PREDEFINED_QUESTIONS,
         selected_questions=predefined_questions,
         custom_questions=custom_questions,  # Send current custom questions
+        response_types=RESPONSE_TYPE_LABELS,
+    )
+
+
+def _attachment(filename):
+    """Content-Disposition for a download, safe for non-ASCII file names.
+
+    Headers must be latin-1, so the name goes out as an ASCII fallback plus the
+    RFC 5987 `filename*` form that browsers prefer.
+    """
+    fallback = (
+        unicodedata.normalize("NFKD", filename).encode("ascii", "ignore").decode()
     )
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+@app.route('/download')
+def download_journal():
+    """Download the whole journal in the legacy wide CSV format.
+
+    Rows are streamed as the journal is read, like `/export/<child>`, so the
+    export is never held in memory whole.
+    """
+    return Response(
+        csv_lines(journal.wide_rows()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": _attachment(CSV_FILE)},
+    )
+
+
+
+@app.route('/export/<child_name>')
+def export_child(child_name):
+    """Stream one child's entries as CSV (default) or NDJSON, oldest first.
+
+    Filters: `start`/`end` ("YYYY-MM-DD", inclusive) and repeated `question`
+    parameters; columns are only the child's own questions. Rows are read and
+    sent one entry at a time, so memory stays flat however long the history is.
+    """
+    if child_name not in config.children():
+        return f"Unknown child '{child_name}'.", 404
+    questions = [q for q in config.questions(child_name) if q.strip()]
+    wanted = request.args.getlist("question")
+    if wanted:
+        questions = [q for q in questions if q in wanted]
+    start, end = (
+        _iso_date(request.args.get("start")),
+        _iso_date(request.args.get("end")),
+    )
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        return "format must be csv or ndjson.", 400
+    qids = [question_id(q) for q in questions]
+
+    def ndjson_rows():
+        for timestamp, values in journal.iter_child(child_name, start, end):
+            record = {"Date/Time": timestamp, "Child Name": child_name}
+            record.update(
+                (q, values.get(qid)) for q, qid in zip(questions, qids, strict=True)
+            )
+            yield json.dumps(record) + "\n"
+
+    def csv_rows():
+        # Header goes out before the journal is read
+        yield ["Date/Time", "Child Name"] + questions
+        for timestamp, values in journal.iter_child(child_name, start, end):
+            yield [timestamp, child_name] + [values.get(qid, "") for qid in qids]
+
+    filename = f"{sanitize_filename(child_name)}_journal.{fmt}"
+    return Response(
+        ndjson_rows() if fmt == "ndjson" else csv_lines(csv_rows()),
+        mimetype="application/x-ndjson" if fmt == "ndjson" else "text/csv",
+        headers={"Content-Disposition": _attachment(filename)},
+    )
+
+@app.route('/import', methods=["GET", "POST"])
+def bulk_import():
+    """Upload a CSV/JSON file of historical entries and import it in batches."""
+    report = None
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            return "No file uploaded.", 400
+        importer = BulkImporter(
+            config,
+            journal.catalog.get(),
+            registry,
+            save_entries,
+            default_child=request.form.get("child_name", "").strip() or None,
+        )
+        stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+        report = importer.run(
+            read_records(stream, upload.filename),
+            dry_run=bool(request.form.get("dry_run")),
+        )
+        if report.unreadable and not report.rows:
+            return f"Could not read {upload.filename}: {report.unreadable}", 400
+        debug(
+            "Imported %s/%s rows at %s rows/s",
+            report.imported,
+            report.rows,
+            report.rows_per_second,
+        )
+        if request.args.get("format") == "json":
+            return jsonify(report.as_dict())
+    return render_template(
+        "import.html", children=get_existing_children(), report=report
+    )
+
 
+# Runs under gunicorn too, so every worker sees a migrated journal
+initialize_csv()
 
 if __name__ == "__main__":
-    initialize_csv()
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""Wall-clock time to render one child's dashboard charts, by number of questions.
+
+Usage: python benchmarks/bench_dashboard.py [max_questions] [days]
+"""
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chart_renderer import CHART_WORKERS, render_all, render_heatmap, render_line_chart  # noqa: E402
+
+
+def make_tasks(directory, num_questions, days):
+    """Build render tasks for a synthetic child with `num_questions` daily series."""
+    rng = np.random.default_rng(0)
+    dates = [
+        day.isoformat()
+        for day in pd.date_range("2023-01-01", periods=days, freq="D").date
+    ]
+    data = pd.DataFrame(
+        {f"Question {i}": rng.integers(0, 10, days) for i in range(num_questions)},
+        index=dates,
+    )
+    paths = [os.path.join(directory, f"{i}.png") for i in range(num_questions)]
+    tasks = [
+        (question, render_line_chart, (dates, data[question].tolist(), question, path))
+        for question, path in zip(data.columns, paths, strict=True)
+    ]
+    heatmap = partial(render_heatmap, data.corr(), "Bench")
+    tasks.append(("heatmap", heatmap, (os.path.join(directory, "heatmap.png"),)))
+    return tasks
+
+
+def time_dashboard(num_questions, days, workers):
+    with tempfile.TemporaryDirectory() as directory:
+        tasks = make_tasks(directory, num_questions, days)
+        start = time.perf_counter()
+        for key, error, _ in render_all(tasks, max_workers=workers):
+            if error is not None:
+                raise RuntimeError(f"{key}: {error}")
+        return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    max_questions = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+
+    # Warm up the pool so process start-up is not billed to the first row
+    time_dashboard(CHART_WORKERS, days, CHART_WORKERS)
+
+    pooled_label = f"pool x{CHART_WORKERS} (s)"
+    print(f"{'questions':>9}  {'serial (s)':>10}  {pooled_label:>12}  {'speedup':>7}")
+    for num_questions in [n for n in (1, 2, 5, 10, 20, 40) if n <= max_questions]:
+        serial = time_dashboard(num_questions, days, workers=1)
+        pooled = time_dashboard(num_questions, days, workers=CHART_WORKERS)
+        print(
+            f"{num_questions:>9}  {serial:>10.2f}  {pooled:>12.2f}  "
+            f"{serial / pooled:>6.1f}x"
+        )
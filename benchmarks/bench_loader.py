@@ -0,0 +1,131 @@
+"""Load time and memory of the typed journal loader against plain pd.read_csv.
+
+Builds a synthetic multi-year, multi-child journal in a temp directory, then
+times the old dashboard path (untyped read of the wide CSV + to_datetime)
+against the typed long read that snapshots.py builds its Parquet files from,
+for a single child's questions.
+
+Usage: python benchmarks/bench_loader.py [children] [years]
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal_loader import pivot_entries, read_long  # noqa: E402
+from journal_store import LONG_HEADERS, JournalStore  # noqa: E402
+from questions import PREDEFINED_QUESTIONS, QuestionRegistry  # noqa: E402
+
+SAMPLE_ANSWERS = {
+    "binary": lambda: random.choice(["0", "1"]),
+    "scale": lambda: str(random.randint(1, 5)),
+    "count": lambda: str(random.randint(0, 12)),
+    "minutes": lambda: str(random.randint(0, 180)),
+    "hours": lambda: str(round(random.uniform(5, 11), 1)),
+    "time_of_day": lambda: (
+        f"{random.randint(6, 9):02d}:{random.choice(['00', '15', '30', '45'])}"
+    ),
+    "free_text": lambda: random.choice(
+        ["Quiet day", "Trouble at school, lots of crying", "Good morning"]
+    ),
+}
+
+
+def build_journal(directory, registry, num_children, years):
+    """Write a synthetic long journal and return (store, {child: questions})."""
+    random.seed(0)
+    all_questions = [
+        question
+        for questions in PREDEFINED_QUESTIONS.values()
+        for question in questions
+    ]
+    selections = {
+        f"Child {i}": random.sample(all_questions, 12) for i in range(num_children)
+    }
+    store = JournalStore(
+        os.path.join(directory, "entries.csv"), os.path.join(directory, "catalog.json")
+    )
+    store.catalog.register(all_questions)
+
+    start = datetime(2020, 1, 1, 20, 0, 0)
+    with open(store.path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(LONG_HEADERS)
+        for day in range(int(365 * years)):
+            timestamp = (start + timedelta(days=day)).strftime("%Y-%m-%d %H:%M:%S")
+            for child, questions in selections.items():
+                entry_id = uuid.uuid4().hex[:16]
+                for question in questions:
+                    answer = SAMPLE_ANSWERS[registry.get(question).response_type]()
+                    writer.writerow(
+                        [
+                            entry_id,
+                            0,
+                            timestamp,
+                            child,
+                            registry.get(question).id,
+                            answer,
+                        ]
+                    )
+    return store, selections
+
+
+def measure(label, load, repeat=3):
+    """Best-of-`repeat` load time, then one traced run for peak memory.
+
+    Tracing skews timing, so the two are measured apart.
+    """
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = load()
+        elapsed.append(time.perf_counter() - start)
+    tracemalloc.start()
+    load()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = df.memory_usage(deep=True).sum()
+    print(
+        f"{label:<32} {min(elapsed) * 1000:>8.1f} ms  {size / 1e6:>7.2f} MB result  "
+        f"{peak / 1e6:>7.2f} MB peak  {df.shape}"
+    )
+
+
+def current_path(wide_path, child):
+    df = pd.read_csv(wide_path)
+    df["Date/Time"] = pd.to_datetime(df["Date/Time"], errors="coerce")
+    return df[df["Child Name"] == child]
+
+
+if __name__ == "__main__":
+    num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    years = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+    registry = QuestionRegistry()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store, selections = build_journal(directory, registry, num_children, years)
+        wide_path = os.path.join(directory, "wide.csv")
+        with open(wide_path, "w", newline="") as f:
+            store.export_wide(f)
+        child, questions = next(iter(selections.items()))
+
+        print(
+            f"{num_children} children x {int(365 * years)} days, "
+            f"{len(questions)} questions per child"
+        )
+        measure("read_csv(wide) + to_datetime", lambda: current_path(wide_path, child))
+        measure(
+            "read_long + pivot (typed, long)",
+            lambda: pivot_entries(
+                read_long(store.path, child=child), registry, questions
+            ).reset_index(drop=True),
+        )
@@ -0,0 +1,211 @@
+"""Latency, throughput and peak memory of the web hot paths at growing journal sizes.
+
+Each size runs in its own process and temp directory: a synthetic journal of
+about that many answer rows is generated, then the Flask routes are driven
+through the test client. Reports p50/p99 latency and requests per second per
+route, and the process's peak RSS.
+
+Usage: python benchmarks/bench_routes.py [rows ...] [--iterations N]
+       [--backend csv|sqlite|sharded]
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SIZES = [1_000, 100_000, 1_000_000]
+QUESTIONS_PER_CHILD = 12
+
+
+def plan(rows):
+    """(children, days) giving about `rows` answers at QUESTIONS_PER_CHILD per entry."""
+    entries = max(1, rows // QUESTIONS_PER_CHILD)
+    children = max(2, min(50, round((entries / 365) ** 0.5 * 2)))
+    return children, max(1, round(entries / children))
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def time_route(client, label, request, iterations):
+    """Run `request(client)` `iterations` times; returns latencies and throughput."""
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = request(client)
+        response.get_data()  # drain streamed bodies too
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code < 400, f"{label}: {response.status_code}"
+    # A single run (the cold chart render) is its own p50 and p99
+    cuts = (
+        statistics.quantiles(latencies, n=100, method="inclusive")
+        if len(latencies) > 1
+        else latencies * 99
+    )
+    return {
+        "route": label,
+        "p50_ms": cuts[49] * 1000,
+        "p99_ms": cuts[98] * 1000,
+        "rps": len(latencies) / sum(latencies),
+    }
+
+
+def run_size(rows, iterations):
+    """Generate the journal in the current directory and benchmark the routes.
+
+    Runs in a child process.
+    """
+    import app
+    from synthetic import generate, populate
+
+    children, days = plan(rows)
+    start = time.perf_counter()
+    selections, entries = generate(children, days, QUESTIONS_PER_CHILD)
+    answers = populate(app.config, app.journal, selections, entries)
+    for cache in (app.aggregates, app.correlations, app.rollups, app.trends):
+        cache.rebuild(app.journal)
+    generated = time.perf_counter() - start
+    rss_after_load = peak_rss_mb()
+
+    child, questions = next(iter(selections.items()))
+    form = {"child_name": child, "action_type": "submit_data"}
+    form.update(
+        {
+            f"q{i}": "3" if app.registry.get(q).is_numeric else "benchmark"
+            for i, q in enumerate(questions)
+        }
+    )
+
+    client = app.app.test_client()
+
+    def drain():
+        start = time.perf_counter()
+        app.jobs.wait()
+        return time.perf_counter() - start
+
+    # Reads first: submits change the data version and would make every read
+    # a cache miss
+    results = [
+        time_route(client, "GET /dashboard", lambda c: c.get("/dashboard"), iterations),
+        time_route(
+            client,
+            "GET /dashboard/<child>",
+            lambda c: c.get(f"/dashboard/{child}"),
+            iterations,
+        ),
+        time_route(
+            client,
+            "GET series API",
+            lambda c: c.get(f"/api/children/{child}/series"),
+            iterations,
+        ),
+        time_route(
+            client,
+            "GET /dashboard/<child> png cold",
+            lambda c: c.get(f"/dashboard/{child}?render=png"),
+            1,
+        ),
+    ]
+    # The cold dashboard queued its charts; they render in the background
+    charts_drained = drain()
+    results += [
+        time_route(
+            client,
+            "GET /dashboard/<child> png",
+            lambda c: c.get(f"/dashboard/{child}?render=png"),
+            iterations,
+        ),
+        time_route(
+            client,
+            "GET /export/<child>",
+            lambda c: c.get(f"/export/{child}"),
+            max(2, iterations // 10),
+        ),
+        time_route(
+            client, "POST /submit", lambda c: c.post("/submit", data=form), iterations
+        ),
+    ]
+    # Submits return once the journal is written; the cache folds they
+    # queued finish here
+    caches_drained = drain()
+    return {
+        "rows": answers,
+        "children": children,
+        "days": days,
+        "generate_s": generated,
+        "rss_after_load_mb": rss_after_load,
+        "peak_rss_mb": peak_rss_mb(),
+        "charts_drain_s": charts_drained,
+        "caches_drain_s": caches_drained,
+        "routes": results,
+    }
+
+
+def report(result):
+    print(
+        f"\n{result['rows']:,} rows "
+        f"({result['children']} children x {result['days']} days), "
+        f"generated in {result['generate_s']:.1f}s; "
+        f"peak RSS {result['rss_after_load_mb']:.0f} MB after load, "
+        f"{result['peak_rss_mb']:.0f} MB after requests"
+    )
+    print(f"  {'route':<30} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    for route in result["routes"]:
+        print(
+            f"  {route['route']:<30} {route['p50_ms']:>9.1f} "
+            f"{route['p99_ms']:>9.1f} {route['rps']:>9.1f}"
+        )
+    print(
+        f"  background jobs: cold charts drawn {result['charts_drain_s']:.2f}s "
+        "after the request, "
+        f"cache folds done {result['caches_drain_s']:.2f}s after the last submit"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", nargs="*", type=int, default=SIZES)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument(
+        "--backend", choices=["csv", "sqlite", "sharded"], default="csv"
+    )
+    parser.add_argument("--child-run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_run:
+        print(json.dumps(run_size(args.rows[0], args.iterations)))
+        sys.exit(0)
+
+    # A fresh process per size, so peak RSS and the app's module-level state
+    # don't carry over
+    env = dict(
+        os.environ, JOURNAL_DEBUG="0", JOURNAL_BACKEND=args.backend, MPLBACKEND="Agg"
+    )
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as directory:
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    str(rows),
+                    "--iterations",
+                    str(args.iterations),
+                    "--child-run",
+                ],
+                cwd=directory,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            if output.returncode != 0:
+                sys.exit(f"{rows} rows failed:\n{output.stderr}")
+            report(json.loads(output.stdout.strip().splitlines()[-1]))
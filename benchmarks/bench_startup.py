@@ -0,0 +1,104 @@
+"""Worker startup cost: app import time and memory, before and after the analytics.
+
+Each run is a fresh interpreter in a temp directory holding a small synthetic
+journal, like a newly forked gunicorn worker. It imports app, serves the form
+routes, then a server-rendered dashboard, and records the RSS and whether
+pandas/matplotlib were loaded at each step.
+
+Usage: python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HEAVY_MODULES = ("pandas", "numpy", "matplotlib", "pyarrow", "seaborn")
+
+
+def rss_mb():
+    """Current resident set size, from /proc (Linux)."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def snapshot(label):
+    return {
+        "step": label,
+        "rss_mb": rss_mb(),
+        "heavy": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+
+
+def run_worker():
+    """One cold start, measured from inside the worker process."""
+    steps = [snapshot("interpreter")]
+    start = time.perf_counter()
+    import app
+    import_seconds = time.perf_counter() - start
+    steps.append(snapshot("import app"))
+
+    client = app.app.test_client()
+    child = app.config.children()[0]
+    for path in ("/", "/data_entry"):
+        client.get(path)
+    client.post(
+        "/submit", data={"child_name": child, "action_type": "submit_data", "q0": "3"}
+    )
+    steps.append(snapshot("form routes"))
+    client.get(f"/dashboard/{child}?render=png")
+    steps.append(snapshot("png dashboard"))
+    return {"import_seconds": import_seconds, "steps": steps}
+
+
+def prepare(directory):
+    """A small synthetic journal for the worker to serve, made in its own process."""
+    subprocess.run(
+        [
+            sys.executable,
+            os.path.join(ROOT, "synthetic.py"),
+            "--children",
+            "2",
+            "--days",
+            "30",
+        ],
+        cwd=directory,
+        env=dict(os.environ, JOURNAL_DEBUG="0"),
+        check=True,
+        capture_output=True,
+    )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--worker"]:
+        print(json.dumps(run_worker()))
+        sys.exit(0)
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        prepare(directory)
+        env = dict(os.environ, JOURNAL_DEBUG="0", PYTHONPATH=ROOT)
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker"],
+                cwd=directory, env=env, check=True, capture_output=True, text=True,
+            )
+            results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    median_import = statistics.median(r["import_seconds"] for r in results)
+    print(f"import app: median {median_import * 1000:.0f} ms over {runs} cold starts")
+    for i, step in enumerate(results[0]["steps"]):
+        rss = statistics.median(r["steps"][i]["rss_mb"] for r in results)
+        print(
+            f"  {step['step']:<16} {rss:>7.1f} MB RSS  "
+            f"loaded: {', '.join(step['heavy']) or '-'}"
+        )
@@ -0,0 +1,104 @@
+"""Cost of keeping the trend cache up to date as a child's history grows.
+
+For each history length, one child with a daily entry of several rated
+questions is loaded into a TrendCache, then further saves are folded in
+and timed: the in-memory fold alone, and TrendCache.record_many with its locked
+file rewrite. The last column is what computing the same numbers from
+scratch would cost per save, i.e. rescanning the whole history.
+
+Usage: python benchmarks/bench_trends.py [saves]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from journal_cache import journal_entries  # noqa: E402
+from trends import TrendCache, _record  # noqa: E402
+
+HISTORY_DAYS = (30, 365, 1825, 3650, 7300)
+QUESTIONS = 8
+CHILD = "Bench Child"
+START = datetime(2000, 1, 1, 20, 0, 0)
+
+
+def entry(rng, day):
+    """The (timestamp, values) of one evening's entry `day` days after START."""
+    timestamp = (START + timedelta(days=day)).strftime("%Y-%m-%d %H:%M:%S")
+    return timestamp, {f"q{i}": str(rng.randint(1, 5)) for i in range(QUESTIONS)}
+
+
+class History:
+    """Enough of a journal store for TrendCache.rebuild: one child's `days` entries."""
+
+    def __init__(self, days, seed=0):
+        self.days = days
+        self.seed = seed
+
+    def iter_entries(self, saves=None):
+        if saves is not None:
+            saves[CHILD] = self.days
+        rng = random.Random(self.seed)
+        for day in range(self.days):
+            timestamp, values = entry(rng, day)
+            yield day, timestamp, CHILD, values
+
+
+def measure(days, saves):
+    history = History(days)
+    rng = random.Random(1)
+    new_entries = [entry(rng, days + i) for i in range(saves)]
+
+    # In memory only; nothing is written
+    cache = TrendCache(None).build(journal_entries(history, {}))
+    fold = []
+    for timestamp, values in new_entries:
+        start = time.perf_counter()
+        _record(cache, CHILD, timestamp, None, values)
+        fold.append(time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as directory:
+        trends = TrendCache(os.path.join(directory, "trends.json"))
+        trends.rebuild(history)
+        record = []
+        for sequence, (timestamp, values) in enumerate(new_entries, start=days + 1):
+            start = time.perf_counter()
+            trends.record_many([(CHILD, timestamp, None, values, sequence)], history)
+            record.append(time.perf_counter() - start)
+        file_kb = os.path.getsize(trends.path) / 1024
+
+    rescans = []
+    for _ in range(3):
+        start = time.perf_counter()
+        TrendCache(None).build(journal_entries(history, {}))
+        rescans.append(time.perf_counter() - start)
+
+    return {
+        "days": days,
+        "fold_us": statistics.median(fold) * 1e6,
+        "record_ms": statistics.median(record) * 1000,
+        "file_kb": file_kb,
+        "rescan_ms": statistics.median(rescans) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    saves = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"{QUESTIONS} questions answered daily; median over {saves} saves")
+    print(
+        f"{'history':>10} {'fold':>10} {'record':>10} "
+        f"{'cache file':>11} {'full rescan':>12}"
+    )
+    for days in HISTORY_DAYS:
+        result = measure(days, saves)
+        print(
+            f"{result['days']:>6} days {result['fold_us']:>7.0f} us "
+            f"{result['record_ms']:>7.2f} ms "
+            f"{result['file_kb']:>8.0f} KB {result['rescan_ms']:>9.0f} ms"
+        )
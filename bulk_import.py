@@ -0,0 +1,412 @@
+import argparse
+import csv
+import itertools
+import json
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from questions import PREDEFINED_QUESTIONS
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Accepted spellings of the entry time; stored as TIMESTAMP_FORMAT
+TIMESTAMP_FORMATS = [
+    TIMESTAMP_FORMAT,
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M",
+    "%Y-%m-%d",
+    "%m/%d/%Y",
+]
+
+TIMESTAMP_COLUMNS = {"date time", "date", "timestamp"}  # normalized headers
+CHILD_COLUMNS = {"child name", "child"}
+
+BATCH_SIZE = 500
+
+# Characters read at a time from a JSON array upload
+JSON_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"\s*")
+
+# Per-row errors kept in the report; later ones are only counted
+MAX_REPORTED_ERRORS = 200
+
+
+def normalize(text):
+    """Comparison key for a column header: case, punctuation and spacing are ignored."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.casefold()).split())
+
+
+@dataclass
+class ImportReport:
+    """Outcome of one bulk import."""
+
+    rows: int = 0
+    imported: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    columns: dict = field(default_factory=dict)  # header -> question text
+    unmapped_columns: list = field(default_factory=list)
+    errors: list = field(default_factory=list)  # {"row": n, "error": message}
+    # Why the file could not be read to the end; rows before that still count
+    unreadable: str = ""
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds, 1) if self.seconds else 0.0
+
+    def add_error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "failed": self.failed,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": self.rows_per_second,
+            "columns": self.columns,
+            "unmapped_columns": self.unmapped_columns,
+            "errors": self.errors,
+            "unreadable": self.unreadable,
+        }
+
+
+@dataclass
+class UnreadableRecord:
+    """Stands in for a JSON line or array element that could not be decoded."""
+
+    error: str
+
+
+def _json_record(line):
+    """Decode one NDJSON line, or an UnreadableRecord saying why it could not be."""
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        return UnreadableRecord(f"invalid JSON ({e})")
+
+
+def _element_end(text):
+    """Index of the "," or "]" ending the array element `text` starts with, or None.
+
+    Strings and nested arrays/objects are skipped, so this finds the end of an
+    element the decoder rejected without understanding it.
+    """
+    depth, in_string, escaped = 0, False, False
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            depth += 1
+        elif not depth and char in ",]":
+            return i
+        elif depth and char in "]}":
+            depth -= 1
+    return None
+
+
+def _json_array(stream, chunk_size=JSON_CHUNK_SIZE):
+    """Yield the elements of a JSON array (its "[" already read), reading in chunks."""
+    decoder = json.JSONDecoder()
+    buffer, eof = "", False
+    expect_value, first = True, True
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            if eof:
+                raise ValueError("The JSON array is not closed")
+            chunk = stream.read(chunk_size)
+            buffer, eof = buffer + chunk, not chunk
+            continue
+        if buffer[0] == "]" and (first or not expect_value):
+            return
+        if not expect_value:
+            if buffer[0] != ",":
+                raise ValueError(
+                    "Expected ',' or ']' between JSON array elements, "
+                    f"found {buffer[0]!r}"
+                )
+            buffer, expect_value = buffer[1:], True
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer)
+            error = "unexpected text after a value"
+            following = buffer[_WHITESPACE.match(buffer, end).end() :][:1]
+        except json.JSONDecodeError as e:
+            end, error, following = None, str(e), ""
+        if end is not None and following in ("]", ","):
+            yield value
+            buffer, expect_value, first = buffer[end:], False, False
+            continue
+        skip = None if end is not None and not following else _element_end(buffer)
+        if skip is not None:
+            # A complete but malformed element; the rest of the array still reads
+            yield UnreadableRecord(f"invalid JSON ({error})")
+            buffer, expect_value, first = buffer[skip:], False, False
+            continue
+        if eof:
+            raise ValueError(f"The JSON array is not closed ({error})")
+        # The element may continue in the next chunk (a number cut off as "1." still
+        # parses as 1)
+        chunk = stream.read(chunk_size)
+        buffer, eof = buffer + chunk, not chunk
+
+
+def read_records(stream, filename=""):
+    """Stream records from a CSV, JSON array or newline-delimited JSON text file.
+
+    CSV rows are dicts; JSON records are whatever each element or line holds,
+    which the importer checks row by row. A line or element that is not valid
+    JSON comes through as an UnreadableRecord.
+    """
+    name = filename.lower()
+    if name.endswith((".ndjson", ".jsonl")):
+        for line in stream:
+            if line.strip():
+                yield _json_record(line)
+        return
+    if name.endswith(".json"):
+        first = stream.read(1)
+        while first.isspace():
+            first = stream.read(1)
+        if first == "[":
+            yield from _json_array(stream)
+        else:
+            for line in itertools.chain([first + stream.readline()], stream):
+                if line.strip():
+                    yield _json_record(line)
+        return
+    yield from csv.DictReader(stream)
+
+
+def question_lookup(config, catalog):
+    """Normalized text -> question text for every question an import may name.
+
+    Predefined questions, anything already in the journal catalog, and each
+    child's selections (which win on a clash).
+    """
+    texts = [
+        question
+        for questions in PREDEFINED_QUESTIONS.values()
+        for question in questions
+    ]
+    texts += list(catalog.values())
+    texts += [question for questions in config.get().values() for question in questions]
+    lookup = {normalize(text): text for text in texts if text.strip()}
+    lookup.update({text: text for text in texts if text.strip()})  # exact matches first
+    return lookup
+
+
+def parse_timestamp(value):
+    """Normalize an entry time to TIMESTAMP_FORMAT, or None if it cannot be read."""
+    value = (value or "").strip()
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime(TIMESTAMP_FORMAT)
+        except ValueError:
+            continue
+    return None
+
+
+def _readable(records, report):
+    """Yield `records` until the file can no longer be read, noting why in `report`."""
+    try:
+        yield from records
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        report.unreadable = str(e)
+
+
+class BulkImporter:
+    """Map, validate and save historical entries in batches.
+
+    Columns are matched to questions by text (ignoring case and punctuation).
+    Each batch of valid rows goes to `save_entries` as one journal write (one
+    SQLite transaction), so a backfill costs one write per batch instead of
+    one per row. Rows that fail validation are reported and skipped.
+    """
+
+    def __init__(
+        self,
+        config,
+        catalog,
+        registry,
+        save_entries,
+        default_child=None,
+        batch_size=BATCH_SIZE,
+    ):
+        self.children = set(config.children())
+        self.lookup = question_lookup(config, catalog)
+        self.registry = registry
+        self.save_entries = save_entries
+        self.default_child = default_child
+        self.batch_size = batch_size
+
+    def _map_columns(self, headers, report):
+        timestamp_column = child_column = None
+        columns = {}
+        for header in headers:
+            key = normalize(header or "")
+            if key in TIMESTAMP_COLUMNS and timestamp_column is None:
+                timestamp_column = header
+            elif key in CHILD_COLUMNS and child_column is None:
+                child_column = header
+            elif header in self.lookup or key in self.lookup:
+                columns[header] = self.lookup.get(header) or self.lookup[key]
+            else:
+                report.unmapped_columns.append(header)
+        report.columns = dict(columns)
+        return timestamp_column, child_column, columns
+
+    def _validate(
+        self, row_number, record, timestamp_column, child_column, columns, report
+    ):
+        """Return (child_name, timestamp, {question: value}) for a valid row.
+
+        An invalid row returns None after recording why.
+        """
+        child_name = (
+            (record.get(child_column) if child_column else None)
+            or self.default_child
+            or ""
+        )
+        if not isinstance(child_name, str):
+            report.add_error(row_number, f"child name {child_name!r} is not text")
+            return None
+        child_name = child_name.strip()
+        if not child_name:
+            report.add_error(row_number, "no child name")
+            return None
+        if child_name not in self.children:
+            report.add_error(row_number, f"unknown child '{child_name}'")
+            return None
+        timestamp = (
+            parse_timestamp(str(record.get(timestamp_column) or ""))
+            if timestamp_column
+            else None
+        )
+        if timestamp is None:
+            report.add_error(
+                row_number,
+                f"missing or unreadable date/time {record.get(timestamp_column)!r}",
+            )
+            return None
+
+        values, problems = {}, []
+        for header, question in columns.items():
+            raw = record.get(header)
+            if isinstance(raw, bool):
+                raw = int(raw)  # JSON true/false for yes/no questions
+            if raw is None or str(raw).strip() == "":
+                continue
+            value = self.registry.get(question).parse(str(raw))
+            if value is None:
+                problems.append(f"invalid answer {raw!r} for '{question}'")
+            else:
+                values[question] = value
+        if problems:
+            report.add_error(row_number, "; ".join(problems))
+            return None
+        return child_name, timestamp, values
+
+    def run(self, records, dry_run=False):
+        """Import an iterable of dict records; returns an ImportReport.
+
+        If the file stops being readable part-way through, the rows before
+        that point are still imported and the report says why it stopped.
+        """
+        report = ImportReport()
+        started = time.perf_counter()
+        mapping = None
+        batch = []
+        headers = {}  # ordered set of every header seen so far
+        for row_number, record in enumerate(_readable(records, report), start=1):
+            if isinstance(record, UnreadableRecord):
+                report.rows += 1
+                report.add_error(row_number, record.error)
+                continue
+            if not isinstance(record, dict):
+                report.rows += 1
+                report.add_error(
+                    row_number,
+                    f"expected an object of named fields, got {type(record).__name__}",
+                )
+                continue
+            if mapping is None or not headers.keys() >= record.keys():
+                # JSON records may introduce new keys part-way through
+                headers.update(dict.fromkeys(record))
+                report.unmapped_columns = []
+                mapping = self._map_columns(list(headers), report)
+            report.rows += 1
+            entry = self._validate(row_number, record, *mapping, report)
+            if entry is not None:
+                batch.append(entry)
+            if len(batch) >= self.batch_size:
+                self._flush(batch, dry_run, report)
+        self._flush(batch, dry_run, report)
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def _flush(self, batch, dry_run, report):
+        if batch and not dry_run:
+            self.save_entries(batch)
+        report.imported += len(batch)
+        batch.clear()
+
+
+if __name__ == "__main__":
+    # Backfill historical entries:
+    #   python bulk_import.py records.csv [--child NAME] [--batch-size N] [--dry-run]
+    parser = argparse.ArgumentParser(
+        description="Bulk import journal entries from a CSV, JSON or NDJSON file."
+    )
+    parser.add_argument("path")
+    parser.add_argument(
+        "--child", help="child name for rows without a Child Name column"
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="validate only; nothing is saved"
+    )
+    args = parser.parse_args()
+
+    from app import config, jobs, journal, registry, save_entries
+
+    importer = BulkImporter(
+        config,
+        journal.catalog.get(),
+        registry,
+        save_entries,
+        default_child=args.child,
+        batch_size=args.batch_size,
+    )
+    with open(args.path, newline="", encoding="utf-8-sig") as file:
+        report = importer.run(read_records(file, args.path), dry_run=args.dry_run)
+    # The cache updates are queued; let them finish before the process exits
+    jobs.wait()
+
+    for header, question in report.columns.items():
+        print(f"  {header!r} -> {question!r}")
+    for header in report.unmapped_columns:
+        print(f"  {header!r} ignored (no matching question)")
+    for error in report.errors:
+        print(f"  row {error['row']}: {error['error']}")
+    if report.unreadable:
+        print(f"  stopped after row {report.rows}: {report.unreadable}")
+    verb = "Validated" if args.dry_run else "Imported"
+    print(f"{verb} {report.imported} of {report.rows} rows ({report.failed} failed) "
+          f"in {report.seconds:.2f}s, {report.rows_per_second} rows/s")
+    sys.exit(1 if report.failed else 0)
@@ -0,0 +1,110 @@
+import contextlib
+import hashlib
+import os
+import re
+import uuid
+
+from file_utils import file_lock
+
+
+def sanitize_filename(filename):
+    """Sanitize a filename by removing special characters."""
+    # Remove all non-alphanumeric and non-space characters
+    filename = re.sub(r'[^\w\s]', '', filename)
+    filename = re.sub(r'\s+', '_', filename)    # Replace spaces with underscores
+    return filename
+
+
+class ChartCache:
+    """Rendered chart PNGs addressed by child, chart name and data version.
+
+    A chart is only rendered when no file exists for its current data version.
+    Files are written to a temp name and renamed into place, so concurrent
+    workers never serve a half-written image, and the least recently used
+    files are evicted once the cache exceeds its size limits. Charts that
+    failed to render are remembered (per process, up to `max_files` of them)
+    so they are not queued again until their data changes.
+    """
+
+    def __init__(self, directory, max_files=500, max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._failed = {}  # path -> None, oldest failure first
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, child_name, chart_name, version, view=""):
+        """File path for a chart of `chart_name` rendered from data version `version`.
+
+        `view` tells apart renders of the same chart over different date
+        ranges or resolutions; it is hashed, so it survives the truncation
+        of long question texts intact.
+        """
+        # Truncate long question texts; the version keeps names unique per data set
+        name = sanitize_filename(child_name) + "_" + sanitize_filename(chart_name)[:80]
+        if view:
+            name += "_" + hashlib.sha1(view.encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.directory, f"{name}_{version}.png")
+
+    def lookup(self, path):
+        """Return True if the chart is cached, marking it as recently used."""
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def failed(self, path):
+        """Return True if rendering the chart at `path` has already failed."""
+        return path in self._failed
+
+    def mark_failed(self, path):
+        """Remember that the chart at `path` could not be rendered."""
+        self._failed[path] = None
+        while len(self._failed) > self.max_files:
+            self._failed.pop(next(iter(self._failed)), None)
+
+    def latest(self, path):
+        """Newest cached render of the chart at `path`, in any data version, or None."""
+        prefix = os.path.basename(path).rsplit("_", 1)[0] + "_"
+        newest = None
+        for entry in os.scandir(self.directory):
+            name = entry.name
+            version = name[len(prefix):]
+            if name.startswith(prefix) and re.fullmatch(r"[0-9a-f]{12}\.png", version):
+                modified = entry.stat().st_mtime
+                if newest is None or modified > newest[0]:
+                    newest = (modified, entry.path)
+        return newest[1] if newest else None
+
+    def store(self, path, render):
+        """Render a chart with `render(tmp_path)` and atomically move it into place."""
+        # Unique per render: several job threads of one process may render the
+        # same chart at once
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp.png"
+        try:
+            render(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def evict(self):
+        """Delete least recently used charts until the cache is within its limits."""
+        with file_lock(self.directory):
+            files = []
+            for entry in os.scandir(self.directory):
+                name = entry.name
+                if entry.is_file() and name.endswith(".png") and ".tmp." not in name:
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            files.sort()  # oldest use first
+
+            total_bytes = sum(size for _, size, _ in files)
+            while files and (
+                len(files) > self.max_files or total_bytes > self.max_bytes
+            ):
+                _, size, path = files.pop(0)
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(path)
+                total_bytes -= size
@@ -0,0 +1,124 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+
+# Headless: workers never open a display, whatever MPLBACKEND says
+matplotlib.use("Agg")
+
+from matplotlib.figure import Figure  # noqa: E402
+
+from correlations import mask_weak  # noqa: E402
+
+# Size of the rendering pool; each worker holds its own copy of matplotlib
+CHART_WORKERS = int(os.environ.get("CHART_WORKERS", min(4, os.cpu_count() or 1)))
+
+_pools = {}
+
+
+def _get_pool(workers):
+    """Create a pool on first use (spawned, so no request threads are forked)."""
+    if workers not in _pools:
+        _pools[workers] = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pools[workers]
+
+
+def render_line_chart(dates, values, question, chart_path):
+    """Plot one question's rolled-up averages (one point per bucket) to `chart_path`."""
+    # Figure objects keep no global state, unlike pyplot, so renders can run
+    # side by side
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.plot(dates, values, marker="o")
+
+    ax.set_title(question)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Average")
+    ax.tick_params(axis="x", labelrotation=45)
+
+    # Limit x-axis labels to reduce overcrowding
+    num_labels = 10  # Adjust this number as needed
+    if len(dates) > num_labels:
+        step = max(1, len(dates) // num_labels)
+        ax.set_xticks(dates[::step])
+
+    fig.tight_layout()
+    fig.savefig(chart_path)
+
+
+def render_heatmap(correlation_matrix, child_name, heatmap_path):
+    """Plot the child's correlation heat map to `heatmap_path`."""
+    import seaborn as sns
+
+    # Shorten labels
+    max_label_length = 15
+    short_labels = {
+        col: (col[:max_label_length] + "...") if len(col) > max_label_length else col
+        for col in correlation_matrix.columns
+    }
+
+    # Filter low correlations and drop insignificant rows/columns
+    filtered_corr = mask_weak(correlation_matrix).rename(
+        columns=short_labels, index=short_labels
+    )
+    if filtered_corr.empty:
+        raise ValueError(f"No correlations for {child_name} are strong enough to plot")
+
+    fig = Figure(figsize=(12, 10))
+    ax = fig.subplots()
+    sns.heatmap(
+        filtered_corr,
+        ax=ax,
+        annot=True,                # Display correlation values
+        fmt=".2f",                 # Limit decimal places
+        cmap="coolwarm",           # Use a perceptually uniform colormap
+        cbar=True,                 # Display color bar
+        annot_kws={"size": 10},    # Annotation font size
+    )
+    ax.set_title(f"Correlation Heatmap for {child_name}", fontsize=16)
+    ax.tick_params(axis="x", labelrotation=45, labelsize=10)  # Rotate x-axis labels
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment("right")
+    # Keep y-axis labels horizontal
+    ax.tick_params(axis="y", labelrotation=0, labelsize=10)
+    fig.tight_layout()
+    fig.savefig(heatmap_path)
+
+
+def _timed_call(function, *args):
+    """Run `function(*args)` and return how long it took, measured where it ran."""
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+
+def render_all(tasks, max_workers=None):
+    """Run `(key, function, args)` render tasks, yielding `(key, error, seconds)` each.
+
+    Results come as tasks finish. Tasks are fanned out across the process
+    pool; `error` is None on success and `seconds` is the render time itself
+    (None on failure), not the wait. A single task (or max_workers=1) is
+    rendered in-process to skip the pool round trip.
+    """
+    workers = CHART_WORKERS if max_workers is None else max_workers
+    if len(tasks) <= 1 or workers <= 1:
+        for key, function, args in tasks:
+            try:
+                seconds = _timed_call(function, *args)
+            except Exception as e:
+                yield key, e, None
+            else:
+                yield key, None, seconds
+        return
+
+    pool = _get_pool(workers)
+    futures = {
+        pool.submit(_timed_call, function, *args): key for key, function, args in tasks
+    }
+    for future in as_completed(futures):
+        error = future.exception()
+        yield futures[future], error, None if error else future.result()
@@ -0,0 +1,30 @@
+from file_utils import JsonFile
+
+
+class ConfigStore(JsonFile):
+    """The child -> selected questions mapping from child_questions.json.
+
+    The parsed mapping stays in memory and is only re-read when another worker
+    replaces the file; every write is an atomic rename under a cross-process lock.
+    """
+
+    stage = "config_load"
+
+    def children(self):
+        """All child names, sorted."""
+        return sorted(self.get().keys())
+
+    def questions(self, child_name):
+        """The questions selected for `child_name` (empty if unknown)."""
+        return self.get().get(child_name, []) if child_name else []
+
+    def add_child(self, child_name):
+        """Register a child with no questions, if not already present."""
+        self.update(lambda config: config.setdefault(child_name, []))
+
+    def set_questions(self, child_name, questions):
+        """Replace the questions selected for `child_name`."""
+        def assign(config):
+            config[child_name] = list(questions)
+
+        self.update(assign)
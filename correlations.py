@@ -0,0 +1,137 @@
+import math
+
+from aggregates import to_number
+from journal_cache import JournalCache, main, payload_version
+
+# Correlations weaker than this are left out of the heat map
+CORRELATION_THRESHOLD = 0.3
+
+
+def _empty_pair():
+    return {"n": 0, "mean_x": 0.0, "mean_y": 0.0, "cxx": 0.0, "cyy": 0.0, "cxy": 0.0}
+
+
+def _add(pair, x, y):
+    """Welford update of one pair's means and co-moments with the observation (x, y)."""
+    pair["n"] += 1
+    dx = x - pair["mean_x"]
+    dy = y - pair["mean_y"]
+    pair["mean_x"] += dx / pair["n"]
+    pair["mean_y"] += dy / pair["n"]
+    pair["cxx"] += dx * (x - pair["mean_x"])
+    pair["cyy"] += dy * (y - pair["mean_y"])
+    pair["cxy"] += dx * (y - pair["mean_y"])
+
+
+def _remove(pair, x, y):
+    """Exact inverse of `_add`, used when an entry is superseded."""
+    n = pair["n"] - 1
+    if n == 0:
+        pair.update(_empty_pair())
+        return
+    mean_x = (pair["n"] * pair["mean_x"] - x) / n
+    mean_y = (pair["n"] * pair["mean_y"] - y) / n
+    pair["cxx"] -= (x - mean_x) * (x - pair["mean_x"])
+    pair["cyy"] -= (y - mean_y) * (y - pair["mean_y"])
+    pair["cxy"] -= (x - mean_x) * (y - pair["mean_y"])
+    pair["n"], pair["mean_x"], pair["mean_y"] = n, mean_x, mean_y
+
+
+def _apply(pairs, values, sign):
+    """Add (sign=1) or retract (sign=-1) one entry in every pair of its answers."""
+    numbers = sorted((qid, to_number(value)) for qid, value in values.items())
+    numbers = [(qid, number) for qid, number in numbers if number is not None]
+    for i, (qid_x, x) in enumerate(numbers):
+        for qid_y, y in numbers[i:]:
+            key = f"{qid_x}|{qid_y}"
+            if sign > 0:
+                _add(pairs.setdefault(key, _empty_pair()), x, y)
+            elif key in pairs:
+                _remove(pairs[key], x, y)
+                if pairs[key]["n"] == 0:
+                    del pairs[key]
+
+
+def _record(cache, child_name, previous, current):
+    pairs = cache.setdefault(child_name, {})
+    if previous:
+        _apply(pairs, previous, -1)
+    _apply(pairs, current, 1)
+
+
+def correlation(pair):
+    """Pearson correlation of one pair's pairwise-complete observations, or NaN."""
+    if pair is None or pair["n"] < 2 or pair["cxx"] <= 0 or pair["cyy"] <= 0:
+        return math.nan
+    return max(-1.0, min(1.0, pair["cxy"] / math.sqrt(pair["cxx"] * pair["cyy"])))
+
+
+class CorrelationCache(JournalCache):
+    """Running pairwise co-moments per child, so the heat map never reads the journal.
+
+    For every pair of numeric questions answered in the same entry we keep the
+    count, both means and the co-moments (Welford), over pairwise-complete
+    observations - the same definition pandas' DataFrame.corr() uses.
+    """
+
+    name = "correlation cache"
+
+    def fold(self, cache, child_name, _timestamp, previous, current):
+        _record(cache, child_name, previous, current)
+
+    def diff(self, cached, expected):
+        problems = []
+        for child_name in sorted(set(cached) | set(expected)):
+            have, want = cached.get(child_name, {}), expected.get(child_name, {})
+            for key in sorted(set(have) | set(want)):
+                got, exp = have.get(key, _empty_pair()), want.get(key, _empty_pair())
+                for field in ("n", "mean_x", "mean_y", "cxx", "cyy", "cxy"):
+                    if not math.isclose(
+                        got[field], exp[field], rel_tol=1e-9, abs_tol=1e-6
+                    ):
+                        problems.append(
+                            f"{child_name}/{key}: {field} is {got[field]}, "
+                            f"expected {exp[field]}"
+                        )
+        return problems
+
+    def data_version(self, child_name, qids):
+        """Short hash that changes with the chart's questions or their co-moments."""
+        qids = sorted(set(qids))
+        pairs = self.get().get(child_name, {})
+        keys = [f"{a}|{b}" for i, a in enumerate(qids) for b in qids[i:]]
+        return payload_version(
+            {
+                "questions": qids,
+                "pairs": {key: pairs[key] for key in keys if key in pairs},
+            }
+        )
+
+    def matrix(self, child_name, labels):
+        """Correlation matrix for the qids in `labels` (qid -> label), in that order."""
+        import pandas as pd  # only the dashboards need it; saves stay pandas-free
+
+        pairs = self.get().get(child_name, {})
+        qids = list(labels)
+        values = [
+            [correlation(pairs.get(f"{min(a, b)}|{max(a, b)}")) for b in qids]
+            for a in qids
+        ]
+        names = [labels[qid] for qid in qids]
+        return pd.DataFrame(values, index=names, columns=names)
+
+
+def mask_weak(correlation_matrix, threshold=CORRELATION_THRESHOLD):
+    """Blank out weak correlations and drop questions left with nothing to show."""
+    masked = correlation_matrix.mask(correlation_matrix.abs() < threshold)
+    return masked.dropna(how="all", axis=0).dropna(how="all", axis=1)
+
+
+if __name__ == "__main__":
+    # Cache maintenance:
+    #   python correlations.py verify   - compare the cache with the raw journal
+    #   python correlations.py repair   - rebuild the children it is behind on
+    #   python correlations.py rebuild  - recompute it from scratch
+    from app import correlations, journal
+
+    main(correlations, journal)
@@ -0,0 +1,79 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+
+from metrics import timed
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on `path` that is shared by every worker process."""
+    # The lock lives in a sidecar file so the data file itself can be replaced
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file, then rename it over `path` so readers see it whole."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        # json.dump would stream through the slower pure-Python encoder
+        f.write(json.dumps(data))
+    os.replace(tmp_path, path)
+
+
+class JsonFile:
+    """A JSON file kept parsed in memory and reloaded only when it changes on disk.
+
+    Readers get the cached object from `get()` and must not mutate it; writers
+    go through `update()`, which holds the cross-process lock and writes atomically.
+    """
+
+    stage = "json_load"  # metrics label for a re-parse of the file
+
+    def __init__(self, path, default=dict):
+        self.path = path
+        self._default = default
+        self._data = default()
+        self._signature = None
+
+    def _signature_on_disk(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def get(self):
+        """Return the parsed file, re-read only if its inode, mtime or size changed."""
+        signature = self._signature_on_disk()
+        if signature is None:
+            self._data, self._signature = self._default(), None
+        elif signature != self._signature:
+            with timed(self.stage), open(self.path, "r") as f:
+                self._data = json.load(f)
+            self._signature = signature
+        return self._data
+
+    def update(self, mutate):
+        """Apply `mutate` to a fresh copy of the data and write it back.
+
+        Returns whatever `mutate` returns.
+        """
+        with file_lock(self.path):
+            # Parsing the file gives a private copy far faster than deep-copying the
+            # cached one
+            if self._signature_on_disk() is None:
+                data = self._default()
+            else:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            result = mutate(data)
+            write_json_atomic(self.path, data)
+            self._data, self._signature = data, self._signature_on_disk()
+        return result
@@ -0,0 +1,156 @@
+import atexit
+import os
+import threading
+import time
+import traceback
+from collections import deque
+
+# Jobs run at once per process; chart jobs fan out further on the rendering pool
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+
+# Finished jobs kept for the status endpoint
+JOB_HISTORY = 100
+
+# How long an exiting process waits for queued jobs; under gunicorn's 30-second
+# graceful timeout
+JOB_DRAIN_SECONDS = float(os.environ.get("JOB_DRAIN_SECONDS", 25))
+
+
+class Job:
+    """One queued unit of work: `function(items)` under a deduplication key."""
+
+    def __init__(self, key, function, items):
+        self.key = key
+        self.function = function
+        self.items = list(items)
+        self.state = "queued"
+        self.submitted = 1  # how many submits this job absorbed
+        self.enqueued_at = time.time()
+        self.started_at = self.finished_at = None
+        self.error = None
+
+    def as_dict(self):
+        return {
+            "key": self.key,
+            "state": self.state,
+            "submitted": self.submitted,
+            "items": len(self.items),
+            "enqueued_at": self.enqueued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """In-process background work queue with per-key deduplication and bounded workers.
+
+    Submitting a key that already has a queued job adds its items to that job
+    instead of queueing another, so a burst of saves for one child becomes one
+    refresh. Jobs with the same key never run at the same time and run in
+    submission order; at most `workers` jobs run at once. Worker threads start
+    on first use (and again after a fork), so each gunicorn worker has its own.
+    A process that exits normally first gives its queued jobs JOB_DRAIN_SECONDS
+    to finish.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, history=JOB_HISTORY):
+        self.workers = workers
+        self._queue = deque()  # queued jobs, oldest first
+        self._pending = {}  # key -> queued job
+        self._running = {}  # key -> running job
+        self._finished = deque(maxlen=history)
+        self._condition = threading.Condition()
+        self._pid = None
+        atexit.register(self._drain)
+
+    def _start(self):
+        if self._pid == os.getpid():
+            return
+        # Threads do not survive a fork; anything queued in the parent stays there
+        self._pid = os.getpid()
+        self._queue.clear()
+        self._pending.clear()
+        self._running.clear()
+        for _ in range(self.workers):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def submit(self, key, function, items=()):
+        """Queue `function(items)` under `key`; returns the job.
+
+        A job already queued under the same key absorbs the items instead.
+        """
+        with self._condition:
+            self._start()
+            job = self._pending.get(key)
+            if job is not None:
+                job.items.extend(items)
+                job.submitted += 1
+                return job
+            job = Job(key, function, items)
+            self._pending[key] = job
+            self._queue.append(job)
+            self._condition.notify()
+            return job
+
+    def _next_job(self):
+        """Oldest queued job whose key is not already running, or None."""
+        for job in self._queue:
+            if job.key not in self._running:
+                self._queue.remove(job)
+                del self._pending[job.key]
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+                job.state, job.started_at = "running", time.time()
+                self._running[job.key] = job
+            try:
+                job.function(job.items)
+            except Exception:
+                job.state, job.error = "failed", traceback.format_exc(limit=5)
+                print(f"Job {job.key} failed:\n{job.error}")
+            else:
+                job.state = "done"
+            with self._condition:
+                job.finished_at = time.time()
+                del self._running[job.key]
+                self._finished.append(job)
+                # Wake workers waiting on this key, and wait()
+                self._condition.notify_all()
+
+    def busy(self, key):
+        """True while a job for `key` is queued or running."""
+        with self._condition:
+            return key in self._pending or key in self._running
+
+    def status(self):
+        """Queued, running and recently finished jobs, for the status endpoint."""
+        with self._condition:
+            return {
+                "workers": self.workers,
+                "queued": [job.as_dict() for job in self._queue],
+                "running": [job.as_dict() for job in self._running.values()],
+                "finished": [job.as_dict() for job in reversed(self._finished)],
+            }
+
+    def _drain(self):
+        if self._pid == os.getpid():  # jobs queued before a fork never run in the child
+            self.wait(JOB_DRAIN_SECONDS)
+
+    def wait(self, timeout=None):
+        """Block until nothing is queued or running; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._queue or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import sys
+
+from file_utils import JsonFile, file_lock, write_json_atomic
+
+
+def payload_version(payload):
+    """Short hash of JSON-serializable data, for cache keys that change with it."""
+    return hashlib.sha1(
+        json.dumps(payload, sort_keys=True).encode("utf-8")
+    ).hexdigest()[:12]
+
+
+def _has_layout(data):
+    """Whether a cache file has the {"saves": ..., "children": ...} layout.
+
+    Older files hold the bare {child: ...} mapping.
+    """
+    return set(data) == {"saves", "children"}
+
+
+def journal_entries(journal, saves):
+    """Every journal entry as (child_name, timestamp, values).
+
+    `saves` is filled with the save counts read.
+    """
+    return (
+        (child_name, timestamp, values)
+        for _, timestamp, child_name, values in journal.iter_entries(saves=saves)
+    )
+
+
+class JournalCache(JsonFile):
+    """Running numbers per child, folded in from saves and rebuildable from the journal.
+
+    Subclasses implement `fold` (one save into the {child: ...} mapping) and
+    `diff` (every difference between two such mappings), and may override
+    `build` when there is a faster way to start from scratch than folding
+    every entry in.
+
+    The file also records how many of each child's saves have been folded
+    in (the journals number them), so a save is never folded twice, a gap
+    left by a fold that never ran is noticed at the next save, and
+    `repair` can bring the whole cache level with the journal at startup.
+    """
+
+    name = "journal cache"  # for maintenance messages
+
+    def fold(self, cache, child_name, timestamp, previous, current):
+        """Fold one save into `cache`; `previous` is the superseded revision, if any."""
+        raise NotImplementedError
+
+    def diff(self, cached, expected):
+        """Describe every difference between two caches."""
+        raise NotImplementedError
+
+    def build(self, entries):
+        """Compute the cache from (child_name, timestamp, values) entries."""
+        cache = {}
+        for child_name, timestamp, values in entries:
+            self.fold(cache, child_name, timestamp, None, values)
+        return cache
+
+    def get(self):
+        """The {child: ...} numbers; an older file is read as it is."""
+        data = super().get()
+        return data["children"] if _has_layout(data) else data
+
+    def save_counts(self):
+        """How many of each child's saves are folded in: {child: count}."""
+        data = super().get()
+        return data["saves"] if _has_layout(data) else {}
+
+    def _update(self, mutate):
+        """Like `update`, with `mutate(saves, cache)`.
+
+        An older file starts over with nothing folded in.
+        """
+
+        def apply(data):
+            if not _has_layout(data):
+                data.clear()
+                data.update(saves={}, children={})
+            return mutate(data["saves"], data["children"])
+
+        return self.update(apply)
+
+    def _rebuild_child(self, saves, cache, child_name, journal):
+        """Replace one child's numbers in `cache` with a build over its entries."""
+        counts = {}
+        entries = (
+            (child_name, timestamp, values)
+            for timestamp, values in journal.iter_child(child_name, saves=counts)
+        )
+        built = self.build(entries)
+        cache.pop(child_name, None)
+        if child_name in built:
+            cache[child_name] = built[child_name]
+        if counts.get(child_name):
+            saves[child_name] = counts[child_name]
+        else:
+            saves.pop(child_name, None)
+
+    def record_many(self, saved, journal):
+        """Fold saves in with a single write.
+
+        Each save is `(child_name, timestamp, previous, current, sequence)`,
+        `sequence` being the child's save number from the journal. Saves already
+        folded in are skipped; if one arrives ahead of the next expected
+        number (an earlier fold was lost), the child is rebuilt from `journal`.
+        """
+        def fold_all(saves, cache):
+            for child_name, timestamp, previous, current, sequence in saved:
+                folded = saves.get(child_name, 0)
+                if sequence <= folded:
+                    continue
+                if sequence == folded + 1:
+                    self.fold(cache, child_name, timestamp, previous, current)
+                    saves[child_name] = sequence
+                else:
+                    self._rebuild_child(saves, cache, child_name, journal)
+
+        self._update(fold_all)
+
+    def repair(self, journal):
+        """Rebuild every child whose folded saves differ from the journal's.
+
+        Returns their names.
+        """
+
+        def catch_up(saves, cache):
+            expected = journal.save_counts()
+            stale = sorted(
+                child_name for child_name in set(saves) | set(expected)
+                if saves.get(child_name, 0) != expected.get(child_name, 0)
+            )
+            for child_name in stale:
+                self._rebuild_child(saves, cache, child_name, journal)
+            return stale
+
+        return self._update(catch_up)
+
+    def rebuild(self, journal):
+        """Recompute the cache from the raw journal and replace the stored copy."""
+        with file_lock(self.path):
+            saves = {}
+            cache = self.build(journal_entries(journal, saves))
+            write_json_atomic(self.path, {"saves": saves, "children": cache})
+        return cache
+
+    def verify(self, journal):
+        """Compare the stored cache with a fresh build; returns the mismatches found."""
+        saves = {}
+        problems = self.diff(self.get(), self.build(journal_entries(journal, saves)))
+        folded = self.save_counts()
+        for child_name in sorted(set(folded) | set(saves)):
+            if folded.get(child_name, 0) != saves.get(child_name, 0):
+                problems.append(
+                    f"{child_name}: {folded.get(child_name, 0)} saves folded in, "
+                    f"the journal has {saves.get(child_name, 0)}"
+                )
+        return problems
+
+
+def main(cache, journal, argv=None):
+    """Maintenance command line for one cache, run from its module's __main__ block.
+
+    `verify` compares the cache with the raw journal (exit status 1 on any
+    mismatch), `repair` rebuilds the children that are behind the journal
+    and `rebuild` recomputes it from scratch.
+    """
+    argv = sys.argv if argv is None else argv
+    command = argv[1] if len(argv) > 1 else ""
+    if command == "verify":
+        problems = cache.verify(journal)
+        for problem in problems:
+            print(problem)
+        print(
+            f"The {cache.name} matches the journal."
+            if not problems
+            else f"{len(problems)} mismatches found."
+        )
+        sys.exit(1 if problems else 0)
+    elif command == "repair":
+        repaired = cache.repair(journal)
+        print(f"Repaired the {cache.name} for {len(repaired)} children.")
+    elif command == "rebuild":
+        rebuilt = cache.rebuild(journal)
+        print(f"Rebuilt the {cache.name} for {len(rebuilt)} children.")
+    else:
+        print(f"Usage: python {os.path.basename(argv[0])} verify | repair | rebuild")
+        sys.exit(1)
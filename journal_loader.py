@@ -0,0 +1,105 @@
+import pandas as pd
+
+from metrics import timed
+from questions import BINARY, COUNT, HOURS, MINUTES, SCALE
+
+# pandas dtype for each response type; anything else (time of day, free
+# text) stays "string"
+RESPONSE_DTYPES = {
+    BINARY: "Int8",
+    SCALE: "Int8",
+    COUNT: "Int16",
+    MINUTES: "Float32",
+    HOURS: "Float32",
+}
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Explicit dtypes for the long journal file, so pandas never has to infer them.
+# Entry ids, timestamps and values repeat once per answer, so categoricals
+# hold each distinct string once and later conversions run per distinct value.
+LONG_DTYPES = {
+    "entry_id": "category",
+    "revision": "int32",
+    "Date/Time": "category",
+    "Child Name": "category",
+    "question_id": "category",
+    "value": "category",
+}
+
+
+def schema(registry, questions):
+    """Map each question text to the pandas dtype of its response type."""
+    return {
+        question: RESPONSE_DTYPES.get(registry.get(question).response_type, "string")
+        for question in questions
+    }
+
+
+def _categorical_map(column, convert):
+    """Apply `convert` to the distinct categories of `column`, then expand by code."""
+    converted = convert(column.cat.categories)
+    return pd.Series(converted.take(column.cat.codes), index=column.index).where(
+        column.cat.codes >= 0
+    )
+
+
+def _cast(column, dtype):
+    """Convert a raw answer column to `dtype`, coercing invalid answers to NA."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        if dtype == "string":
+            return column.astype("string")
+        column = _categorical_map(
+            column, lambda values: pd.to_numeric(values.astype(str), errors="coerce")
+        )
+    if dtype == "string":
+        return column.astype("string")
+    numbers = pd.to_numeric(column, errors="coerce")
+    if dtype.startswith("Int") and not (numbers.dropna() % 1 == 0).all():
+        dtype = "Float32"  # stray fractional answers in a count column
+    return numbers.astype(dtype)
+
+
+def read_long(source, child=None):
+    """Read long-format journal rows, keeping the latest revision of each entry."""
+    with timed("csv_read"):
+        df = pd.read_csv(
+            source, usecols=list(LONG_DTYPES), dtype=LONG_DTYPES, keep_default_na=False
+        )
+    if child is not None:
+        df = df[df["Child Name"] == child]
+    return df[
+        df["revision"]
+        == df.groupby("entry_id", observed=True)["revision"].transform("max")
+    ]
+
+
+def pivot_entries(df, registry, questions):
+    """Turn long rows into one typed row per entry_id, with a column per question."""
+    questions = list(
+        dict.fromkeys(question for question in questions if question.strip())
+    )
+    ids = {registry.get(question).id: question for question in questions}
+
+    entries = df.drop_duplicates("entry_id").set_index("entry_id")[
+        ["Date/Time", "Child Name"]
+    ]
+    with timed("datetime_parse"):
+        entries["Date/Time"] = _categorical_map(
+            entries["Date/Time"],
+            lambda values: pd.to_datetime(values, format=DATE_FORMAT, errors="coerce"),
+        )
+    with timed("pivot"):
+        answers = df[df["question_id"].isin(ids)]
+        values = answers.pivot(index="entry_id", columns="question_id", values="value")
+
+    result = entries.join(values.rename(columns=ids))
+    result["Child Name"] = result["Child Name"].cat.remove_unused_categories()
+    for question, dtype in schema(registry, questions).items():
+        column = (
+            result[question]
+            if question in result
+            else pd.Series(pd.NA, index=result.index)
+        )
+        result[question] = _cast(column, dtype)
+    return result[["Date/Time", "Child Name"] + questions]
@@ -0,0 +1,380 @@
+import csv
+import io
+import os
+import sys
+import uuid
+from contextlib import ExitStack
+
+from file_utils import JsonFile, file_lock
+from questions import question_id
+
+WIDE_HEADERS = ["Date/Time", "Child Name"]
+LONG_HEADERS = [
+    "entry_id",
+    "revision",
+    "Date/Time",
+    "Child Name",
+    "question_id",
+    "value",
+]
+
+
+def csv_lines(rows):
+    """Render each row as one CSV line, for streaming a response row by row."""
+    line = io.StringIO()
+    writer = csv.writer(line)
+    for row in rows:
+        line.seek(0)
+        line.truncate()
+        writer.writerow(row)
+        yield line.getvalue()
+
+
+def _read_rows(f):
+    """Yield (offset, row) per CSV record from a binary file's current position."""
+    position = [f.tell()]
+
+    def lines():
+        for raw in iter(f.readline, b""):
+            position[0] += len(raw)
+            yield raw.decode("utf-8")
+
+    # csv.reader only pulls the lines it needs, so `position` marks the end
+    # of each record
+    start = position[0]
+    for row in csv.reader(lines()):
+        yield start, row
+        start = position[0]
+
+
+def _encode_rows(rows):
+    """Serialize CSV records exactly as csv.writer would."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+class QuestionCatalog(JsonFile):
+    """Ordered question_id -> question text mapping stored next to the journal.
+
+    Adding a question only touches this file; journal history is never rewritten.
+    """
+
+    def register(self, questions):
+        """Add any unknown questions (in order) and return their ids."""
+        ids = [question_id(question) for question in questions]
+        if all(qid in self.get() for qid in ids):
+            return ids
+
+        def add_missing(catalog):
+            for qid, question in zip(ids, questions, strict=True):
+                catalog.setdefault(qid, question)
+
+        self.update(add_missing)
+        return ids
+
+
+class WideCsvMixin:
+    """Legacy wide CSV import/export for any journal backend.
+
+    The backend needs `catalog`, `save` and `iter_entries`.
+    """
+
+    def wide_rows(self):
+        """Yield the legacy column-per-question CSV rows one at a time, header first."""
+        catalog = self.catalog.get()
+        columns = list(catalog)
+        yield WIDE_HEADERS + [catalog[qid] for qid in columns]
+        for _, timestamp, child_name, values in self.iter_entries():
+            yield [timestamp, child_name] + [values.get(qid, "") for qid in columns]
+
+    def export_wide(self, out):
+        """Write the journal to `out` in the legacy column-per-question CSV format."""
+        csv.writer(out).writerows(self.wide_rows())
+
+    def import_wide(self, path):
+        """One-off migration of a legacy wide CSV into this journal."""
+        with open(path, mode="r", newline="") as file:
+            reader = csv.DictReader(file)
+            questions = [
+                header
+                for header in reader.fieldnames or []
+                if header and header not in WIDE_HEADERS
+            ]
+            self.catalog.register(questions)
+            for row in reader:
+                values = {
+                    question: row[question]
+                    for question in questions
+                    if row.get(question)
+                }
+                self.save(row["Child Name"], row["Date/Time"], values)
+
+
+class JournalStore(WideCsvMixin):
+    """Append-only long-format journal: one (entry, question, value) record per answer.
+
+    Every save appends a complete batch of rows for the entry under a new
+    revision, so updating an entry never touches older rows; readers keep the
+    latest revision of each entry. An in-memory (child, timestamp) index points
+    at the latest batch. The file is only rewritten by `compact()`.
+
+    Each child's saves are numbered in order (the sum of revision + 1 over
+    its entries, so compaction keeps the numbering); the running caches use
+    the numbers to tell which saves they already include.
+    """
+
+    backend = "csv"
+
+    def __init__(self, path, catalog_path):
+        self.path = path
+        self.catalog = QuestionCatalog(catalog_path)
+        # (child, timestamp) -> (entry_id, revision, offset of the latest batch)
+        self._index = {}
+        self._saves = {}  # child -> number of saves indexed
+        self._indexed_to = 0  # bytes of the file already covered by the index
+        self._inode = None
+
+    def _refresh(self):
+        """Index batches appended since the last call (possibly by another worker)."""
+        if not os.path.exists(self.path):
+            self._index, self._saves, self._indexed_to, self._inode = {}, {}, 0, None
+            return
+        stat = os.stat(self.path)
+        if stat.st_ino != self._inode or stat.st_size < self._indexed_to:
+            # The file was compacted or replaced; rebuild the index from scratch
+            self._index, self._saves, self._indexed_to = {}, {}, 0
+            self._inode = stat.st_ino
+        if stat.st_size == self._indexed_to:
+            return
+
+        with open(self.path, "rb") as f:
+            f.seek(self._indexed_to)
+            rows = _read_rows(f)
+            if self._indexed_to == 0:
+                next(rows, None)  # skip the header
+            for offset, row in rows:
+                if not row:
+                    continue
+                entry_id, revision, timestamp, child_name = row[:4]
+                key = (child_name, timestamp)
+                batch = (entry_id, int(revision))
+                indexed = self._index.get(key)
+                if indexed is None or indexed[:2] != batch:
+                    # Revisions count up from 0, one per save
+                    added = batch[1] - (indexed[1] if indexed else -1)
+                    self._saves[child_name] = self._saves.get(child_name, 0) + added
+                    self._index[key] = batch + (offset,)
+            self._indexed_to = f.tell()
+
+    def _read_batch(self, offset, f=None):
+        """Return {question_id: value} for the batch at `offset` (in `f`, if given)."""
+        if f is None:
+            with open(self.path, "rb") as f:
+                return self._read_batch(offset, f)
+        values = {}
+        f.seek(offset)
+        batch = None
+        for _, row in _read_rows(f):
+            if batch is None:
+                batch = row[:2]
+            elif row[:2] != batch:
+                break
+            if row[4]:
+                values[row[4]] = row[5]
+        return values
+
+    def save(self, child_name, timestamp, values):
+        """Append an entry, merging it into an existing entry with the same key.
+
+        `values` maps question text to the answer; questions not yet in the
+        catalog are registered as metadata. Returns (previous, current,
+        sequence): the entry before and after as {question_id: value} dicts,
+        with previous None for a new entry, and the child's save number.
+        """
+        return self.save_many([(child_name, timestamp, values)])[0]
+
+    def save_many(self, entries):
+        """Append `(child_name, timestamp, values)` entries in one locked write.
+
+        Each entry is merged exactly as `save` would; returns one
+        (previous, current, sequence) triple per entry.
+        """
+        entries = list(entries)
+        texts = list(
+            dict.fromkeys(question for _, _, values in entries for question in values)
+        )
+        ids = dict(zip(texts, self.catalog.register(texts), strict=True))
+        with file_lock(self.path):
+            self._refresh()
+            new_file = not os.path.exists(self.path)
+            with open(self.path, "ab") as f:
+                if new_file:
+                    f.write(_encode_rows([LONG_HEADERS]))
+                offset = f.tell()
+
+                chunks, results, index, written, saves = [], [], {}, {}, {}
+                for child_name, timestamp, values in entries:
+                    key = (child_name, timestamp)
+                    merged, previous = {}, None
+                    if key in index or key in self._index:
+                        entry_id, revision, batch_offset = (
+                            index.get(key) or self._index[key]
+                        )
+                        # An entry repeated within this call is merged with
+                        # its pending batch
+                        previous = (
+                            written[key]
+                            if key in written
+                            else self._read_batch(batch_offset)
+                        )
+                        merged.update(previous)
+                        revision += 1
+                    else:
+                        entry_id, revision = uuid.uuid4().hex[:16], 0
+                    for question, value in values.items():
+                        merged[ids[question]] = "" if value is None else value
+
+                    rows = [
+                        [entry_id, revision, timestamp, child_name, qid, value]
+                        for qid, value in merged.items()
+                        if value != ""
+                    ]
+                    if not rows:
+                        # Keep a marker so an entry with no answers still counts
+                        # as an entry
+                        rows = [[entry_id, revision, timestamp, child_name, "", ""]]
+
+                    data = _encode_rows(rows)
+                    chunks.append(data)
+                    index[key] = (entry_id, revision, offset)
+                    offset += len(data)
+                    written[key] = {row[4]: row[5] for row in rows if row[4]}
+                    saves[child_name] = (
+                        saves.get(child_name, self._saves.get(child_name, 0)) + 1
+                    )
+                    results.append((previous, written[key], saves[child_name]))
+
+                f.write(b"".join(chunks))
+                end = f.tell()
+            if new_file:
+                self._inode = os.stat(self.path).st_ino
+            self._index.update(index)
+            self._saves.update(saves)
+            self._indexed_to = end
+        return results
+
+    def exists(self):
+        """Whether anything has been written to the journal yet."""
+        return os.path.exists(self.path)
+
+    def save_counts(self):
+        """How many saves each child with entries has had: {child: count}."""
+        with file_lock(self.path):
+            self._refresh()
+            return dict(self._saves)
+
+    def iter_child(self, child_name, start=None, end=None, saves=None):
+        """Yield one child's (timestamp, {question_id: value}) entries in time order.
+
+        `start` and `end` are inclusive "YYYY-MM-DD" dates. Only that child's
+        batches are read, by seeking to the offsets in the index. A `saves`
+        dict is given the child's save count as of the entries yielded.
+        """
+        with ExitStack() as stack:
+            with file_lock(self.path):
+                self._refresh()
+                if saves is not None:
+                    saves[child_name] = self._saves.get(child_name, 0)
+                batches = sorted(
+                    (timestamp, offset)
+                    for (name, timestamp), (_, _, offset) in self._index.items()
+                    if name == child_name
+                    and (start is None or timestamp[:10] >= start)
+                    and (end is None or timestamp[:10] <= end)
+                )
+                if not batches:
+                    return
+                # Opened under the lock (which is released while reading), so a
+                # concurrent compaction can't move the batches under us
+                f = stack.enter_context(open(self.path, "rb"))
+            for timestamp, offset in batches:
+                yield timestamp, self._read_batch(offset, f)
+
+    def iter_entries(self, saves=None):
+        """Yield (entry_id, timestamp, child_name, {question_id: value}) per entry.
+
+        Only the latest revision of each entry is yielded. A `saves` dict is
+        given every child's save count as of the entries yielded.
+        """
+        with file_lock(self.path):
+            self._refresh()
+            if saves is not None:
+                saves.update(self._saves)
+            latest = {
+                (entry_id, str(revision))
+                for entry_id, revision, _ in self._index.values()
+            }
+            end = self._indexed_to
+        if not latest:
+            return
+
+        with open(self.path, "rb") as f:
+            rows = _read_rows(f)
+            next(rows, None)  # skip the header
+            current, values = None, {}
+            for offset, row in rows:
+                if offset >= end:
+                    break
+                if not row or (row[0], row[1]) not in latest:
+                    continue
+                if current is not None and current[:2] != row[:2]:
+                    yield current[0], current[2], current[3], values
+                    values = {}
+                current = row
+                if row[4]:
+                    values[row[4]] = row[5]
+            if current is not None:
+                yield current[0], current[2], current[3], values
+
+    def compact(self):
+        """Drop superseded revisions. Queued by the app as a background job."""
+        with file_lock(self.path):
+            self._refresh()
+            if not os.path.exists(self.path):
+                return
+            latest = {
+                (entry_id, str(revision))
+                for entry_id, revision, _ in self._index.values()
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as out, open(self.path, "rb") as f:
+                out.write(_encode_rows([LONG_HEADERS]))
+                rows = _read_rows(f)
+                next(rows, None)  # skip the header
+                for _, row in rows:
+                    if row and (row[0], row[1]) in latest:
+                        out.write(_encode_rows([row]))
+            os.replace(tmp_path, self.path)
+            self._index, self._saves, self._indexed_to, self._inode = {}, {}, 0, None
+            self._refresh()
+
+
+if __name__ == "__main__":
+    # Maintenance commands:
+    #   python journal_store.py compact
+    #   python journal_store.py export [wide.csv]
+    from app import CSV_FILE, journal
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "compact":
+        journal.compact()
+        print(f"Compacted the {journal.backend} journal")
+    elif command == "export":
+        path = sys.argv[2] if len(sys.argv) > 2 else CSV_FILE
+        with open(path, mode="w", newline="") as file:
+            journal.export_wide(file)
+        print(f"Exported the {journal.backend} journal to {path}")
+    else:
+        print("Usage: python journal_store.py compact | export [path]")
+        sys.exit(1)
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# JOURNAL_DEBUG=0 turns the debug dumps off completely (the arguments are never even
+# formatted)
+DEBUG = os.environ.get("JOURNAL_DEBUG", "1") != "0"
+
+# Upper bounds in seconds, from a cached JSON read up to a cold chart render
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def debug(message, *args):
+    """Print a debug line, %-formatting `args` only when debugging is on."""
+    if DEBUG:
+        print(message % args if args else message)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """A latency histogram with one label, rendered in the Prometheus text format.
+
+    Counts live in the process, so under gunicorn each worker reports its own.
+    """
+
+    def __init__(self, name, description, label, buckets=BUCKETS):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # label value -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        with self._lock:
+            empty = [0] * (len(self.buckets) + 1) + [0.0]
+            series = self._series.setdefault(label_value, empty)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1  # cumulative, as Prometheus expects
+            series[-2] += 1
+            series[-1] += seconds
+
+    @contextmanager
+    def time(self, label_value):
+        """Observe the wall time of the `with` block, even if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(label_value, time.perf_counter() - started)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = {value: list(counts) for value, counts in self._series.items()}
+        for value, counts in sorted(series.items()):
+            label = f'{self.label}="{_escape(value)}"'
+            for bound, count in zip(self.buckets, counts[:-2], strict=True):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {counts[-2]}')
+            lines.append(f"{self.name}_count{{{label}}} {counts[-2]}")
+            lines.append(f"{self.name}_sum{{{label}}} {counts[-1]:.6f}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "journal_request_duration_seconds",
+    "Time spent handling each request, by endpoint.",
+    "endpoint",
+)
+STAGE_SECONDS = Histogram(
+    "journal_stage_duration_seconds",
+    "Time spent in each expensive stage of a request.",
+    "stage",
+)
+
+
+def timed(stage):
+    """Context manager recording the block's duration under `stage` in STAGE_SECONDS."""
+    return STAGE_SECONDS.time(stage)
+
+
+def render_metrics():
+    """Every histogram in the Prometheus text exposition format."""
+    return "\n".join(REQUEST_SECONDS.render() + STAGE_SECONDS.render()) + "\n"
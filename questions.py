@@ -0,0 +1,247 @@
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Callable
+
+# Predefined question groups and their questions
+PREDEFINED_QUESTIONS = {
+    "Behavior and Emotions": [
+        "On a scale of 1–5, how stable was your child’s mood today?",
+        "How many emotional outbursts did your child have today?",
+        "How many meltdowns occurred today?",
+        "How many instances of aggression occurred today?",
+        "How many minutes did the longest meltdown last?",
+        "On a scale of 1–5, how intense was the most severe meltdown?",
+        "How many times did your child direct aggression toward others?",
+        "How many times did your child direct aggression toward themselves?"
+    ],
+    "Daily Activities": [
+        "How many hours did your child sleep last night?",
+        "What time did your child wake up?",
+        "What time did your child fall asleep?",
+        "How many naps did your child take today?",
+        "How many minutes did your child nap today?",
+        "On a scale of 1–5, how well did your child eat today?",
+        "How many meals/snacks did your child eat today?",
+        "How many new foods did your child try today?",
+        "How many minutes/hours did your child spend on screens today?",
+        "How many minutes of physical activity did your child get today?",
+        "On a scale of 1–5, how engaged was your child in physical activities?"
+    ],
+    "Sensory Concerns": [
+        "How many sensory-related behaviors occurred today?",
+        "How many times did your child react strongly to sensory input today?",
+        "On a scale of 1–5, how sensitive was your child to sensory input today?",
+        "How many times did your child engage in sensory-seeking behaviors today?",
+        "How many minutes did your child spend in sensory play today?",
+        "How many times did your child show sensitivity to touch today?"
+    ],
+    "Cognitive and Academic Performance": [
+        "On a scale of 1–5, how well was your child able to focus on tasks today?",
+        "How many times did your child lose focus during structured activities?",
+        "How many minutes of focused activity was your child able to sustain "
+        "at one time?",
+        "How many tasks did your child complete today?",
+        "How many learning-related frustrations did your child express today?",
+        "How many minutes did your child spend on schoolwork or learning "
+        "activities today?"
+    ],
+    "Health and Medical": [
+        "How many times did your child complain about physical discomfort today?",
+        "How many times did your child wake up during the night?",
+        "How long did it take (in minutes) for your child to fall asleep?",
+        "How many doses of medication were administered today?",
+        "How many side effects were observed today (e.g., drowsiness, appetite loss)?",
+        "How many seizures or unusual movements occurred today?",
+        "On a scale of 1–5, how severe were your child’s symptoms today?"
+    ],
+    "Parent and Caregiver Observations": [
+        "On a scale of 1–5, how stressed did you feel today while caring for "
+        "your child?",
+        "How many minutes did you spend on self-care today?",
+        "How many positive interactions did you have with your child today "
+        "(e.g., hugs, playing together)?",
+        "What was the most challenging part of caring for your child today?",
+        "What was the most positive part of your child’s day today?"
+    ]
+}
+
+BINARY = "binary"
+SCALE = "scale"
+COUNT = "count"
+MINUTES = "minutes"
+HOURS = "hours"
+TIME_OF_DAY = "time_of_day"
+FREE_TEXT = "free_text"
+
+# Response types whose answers are numbers and can be averaged or charted
+NUMERIC_TYPES = {BINARY, SCALE, COUNT, MINUTES, HOURS}
+
+# What a custom question's answer can be, as offered when the question is added
+RESPONSE_TYPE_LABELS = {
+    FREE_TEXT: "Free text",
+    BINARY: "Yes/No (1 or 0)",
+    SCALE: "Scale of 1–5",
+    COUNT: "Count",
+    MINUTES: "Minutes",
+    HOURS: "Hours",
+    TIME_OF_DAY: "Time of day",
+}
+
+CUSTOM_CATEGORY = "Custom"
+
+
+def question_id(question):
+    """Stable id for a question, derived from its text."""
+    return hashlib.sha1(question.encode("utf-8")).hexdigest()[:10]
+
+
+def classify(question):
+    """Infer the response type of a question from its wording."""
+    text = question.lower().strip()
+    if text.startswith("did"):
+        return BINARY
+    if text.startswith("on a scale of 1–5"):
+        return SCALE
+    if text.startswith("what time"):
+        return TIME_OF_DAY
+    if "minutes" in text:
+        return MINUTES
+    if text.startswith("how many hours"):
+        return HOURS
+    if text.startswith("how many"):
+        return COUNT
+    return FREE_TEXT
+
+
+def _parse_binary(response):
+    return int(response) if response in ["1", "0"] else None
+
+
+def _parse_scale(response):
+    return int(response) if response.isdecimal() and 1 <= int(response) <= 5 else None
+
+
+def _parse_count(response):
+    return int(response) if response.isdecimal() else None
+
+
+def _parse_amount(response):
+    """Non-negative number of minutes or hours, kept as an int when it is whole."""
+    try:
+        number = float(response)
+    except ValueError:
+        return None
+    if not number >= 0 or number == float("inf"):
+        return None
+    return int(number) if number.is_integer() else number
+
+
+_TIME_PATTERN = re.compile(r"^(\d{1,2})(?::(\d{2}))?\s*([ap]\.?m\.?)?$", re.IGNORECASE)
+
+
+def _parse_time_of_day(response):
+    """Normalize "7:30", "19:05" or "7:30 pm" to 24-hour "HH:MM"."""
+    match = _TIME_PATTERN.match(response)
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    meridiem = match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower().startswith("p") else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}"
+
+
+def _parse_free_text(response):
+    return response or None
+
+
+PARSERS = {
+    BINARY: _parse_binary,
+    SCALE: _parse_scale,
+    COUNT: _parse_count,
+    MINUTES: _parse_amount,
+    HOURS: _parse_amount,
+    TIME_OF_DAY: _parse_time_of_day,
+    FREE_TEXT: _parse_free_text,
+}
+
+
+@dataclass(frozen=True)
+class Question:
+    """Precomputed metadata for one question."""
+
+    id: str
+    text: str
+    category: str
+    response_type: str
+    parser: Callable
+
+    @property
+    def is_numeric(self):
+        return self.response_type in NUMERIC_TYPES
+
+    def parse(self, response):
+        """Validate a raw form answer: the typed value, or None if blank or invalid."""
+        response = (response or "").strip()
+        return self.parser(response) if response else None
+
+
+class QuestionRegistry:
+    """Question metadata keyed by text and by id, so lookups are dictionary hits.
+
+    Predefined questions are registered up front; custom questions are
+    classified the first time they are seen and cached from then on. A custom
+    question's response type can be set by the user in `custom_types`, a
+    JsonFile of question_id -> response type, which overrides the wording.
+    """
+
+    def __init__(self, predefined=PREDEFINED_QUESTIONS, custom_types=None):
+        self._by_text = {}
+        self._by_id = {}
+        self._custom_types = custom_types
+        for category, questions in predefined.items():
+            for text in questions:
+                self._add(text, category, classify(text))
+
+    def _add(self, text, category, response_type):
+        question = Question(
+            question_id(text), text, category, response_type, PARSERS[response_type]
+        )
+        self._by_text[text] = question
+        self._by_id[question.id] = question
+        return question
+
+    def _custom_type(self, text, qid):
+        chosen = self._custom_types.get() if self._custom_types is not None else {}
+        response_type = chosen.get(qid)
+        return response_type if response_type in PARSERS else classify(text)
+
+    def get(self, text):
+        """Metadata for a question text, registering it as a custom question if new."""
+        question = self._by_text.get(text)
+        if question is None:
+            question = self._add(
+                text, CUSTOM_CATEGORY, self._custom_type(text, question_id(text))
+            )
+        elif question.category == CUSTOM_CATEGORY:
+            # Another worker may have changed the type since it was cached
+            response_type = self._custom_type(text, question.id)
+            if response_type != question.response_type:
+                question = self._add(text, CUSTOM_CATEGORY, response_type)
+        return question
+
+    def by_id(self, qid):
+        """Metadata for a question id, or None if the question has not been seen."""
+        return self._by_id.get(qid)
+
+    def parse_responses(self, questions, form):
+        """Parse the q0..qN answers of a submitted data entry form."""
+        return [
+            self.get(question).parse(form.get(f"q{i}", ""))
+            for i, question in enumerate(questions)
+        ]
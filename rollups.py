@@ -0,0 +1,196 @@
+import math
+from datetime import date, timedelta
+
+from aggregates import to_number
+from journal_cache import JournalCache, main, payload_version
+
+# Finest first; the dashboards pick the finest one that fits their pixel budget
+RESOLUTIONS = ("day", "week", "month")
+
+# Horizontal pixels each plotted point needs to stay readable
+PIXELS_PER_POINT = 4
+
+
+def bucket_key(day, resolution):
+    """Bucket label for a "YYYY-MM-DD" date: the day, its week's Monday or "YYYY-MM"."""
+    if resolution == "day":
+        return day
+    if resolution == "month":
+        return day[:7]
+    parsed = date.fromisoformat(day)
+    return (parsed - timedelta(days=parsed.weekday())).isoformat()
+
+
+def bucket_days(key, resolution):
+    """Every "YYYY-MM-DD" date a week or month bucket can hold.
+
+    A few past the month's end are harmless.
+    """
+    if resolution == "month":
+        return [f"{key}-{day:02d}" for day in range(1, 32)]
+    monday = date.fromisoformat(key)
+    return [(monday + timedelta(days=offset)).isoformat() for offset in range(7)]
+
+
+def _add(bucket, number):
+    bucket["count"] += 1
+    bucket["sum"] += number
+    bucket["min"] = number if bucket["min"] is None else min(bucket["min"], number)
+    bucket["max"] = number if bucket["max"] is None else max(bucket["max"], number)
+    if "values" in bucket:
+        key = repr(number)
+        bucket["values"][key] = bucket["values"].get(key, 0) + 1
+
+
+def _retract(question, resolution, key, number):
+    """Remove one answer from a bucket; min/max are re-derived if it was an extreme."""
+    bucket = question[resolution][key]
+    bucket["count"] -= 1
+    bucket["sum"] -= number
+    if bucket["count"] == 0:
+        del question[resolution][key]
+        return
+    if resolution == "day":
+        counts = bucket["values"]
+        counts[repr(number)] -= 1
+        if not counts[repr(number)]:
+            del counts[repr(number)]
+        numbers = [float(value) for value in counts]
+        bucket["min"], bucket["max"] = min(numbers), max(numbers)
+    elif number <= bucket["min"] or number >= bucket["max"]:
+        # Daily buckets are already up to date; look up just the (at most 31) days
+        # in this bucket
+        daily = question["day"]
+        days = [daily[day] for day in bucket_days(key, resolution) if day in daily]
+        bucket["min"] = min(day["min"] for day in days)
+        bucket["max"] = max(day["max"] for day in days)
+
+
+def _apply(child_rollups, day, values, sign):
+    """Add (sign=1) or retract (sign=-1) an entry's answers in its rollup buckets."""
+    for qid, value in values.items():
+        number = to_number(value)
+        if number is None:
+            continue
+        question = child_rollups.setdefault(
+            qid, {resolution: {} for resolution in RESOLUTIONS}
+        )
+        # Days first, so weeks and months can re-derive from them
+        for resolution in RESOLUTIONS:
+            key = bucket_key(day, resolution)
+            if sign > 0:
+                empty = {"count": 0, "sum": 0.0, "min": None, "max": None}
+                if resolution == "day":
+                    empty["values"] = {}
+                _add(question[resolution].setdefault(key, empty), number)
+            elif key in question[resolution]:
+                _retract(question, resolution, key, number)
+        if not question["day"]:
+            del child_rollups[qid]
+
+
+def _record(cache, child_name, timestamp, previous, current):
+    child_rollups = cache.setdefault(child_name, {})
+    day = timestamp[:10]  # "YYYY-MM-DD"
+    if previous:
+        _apply(child_rollups, day, previous, -1)
+    _apply(child_rollups, day, current, 1)
+
+
+def _in_range(buckets, resolution, start=None, end=None):
+    """Sorted (key, bucket) pairs overlapping the "YYYY-MM-DD" range [start, end]."""
+    low = bucket_key(start, resolution) if start else None
+    high = bucket_key(end, resolution) if end else None
+    return sorted(
+        (key, bucket) for key, bucket in buckets.items()
+        if (low is None or key >= low) and (high is None or key <= high)
+    )
+
+
+class RollupCache(JournalCache):
+    """Daily, weekly and monthly count/sum/min/max per child and question.
+
+    Updated on every save, so a chart over any date range reads at most one
+    point per bucket instead of grouping the child's whole history.
+    """
+
+    name = "rollup cache"
+
+    def fold(self, cache, child_name, timestamp, previous, current):
+        _record(cache, child_name, timestamp, previous, current)
+
+    def diff(self, cached, expected):
+        problems = []
+        for child_name in sorted(set(cached) | set(expected)):
+            have, want = cached.get(child_name, {}), expected.get(child_name, {})
+            for qid in sorted(set(have) | set(want)):
+                for resolution in RESOLUTIONS:
+                    got = have.get(qid, {}).get(resolution, {})
+                    exp = want.get(qid, {}).get(resolution, {})
+                    for key in sorted(set(got) | set(exp)):
+                        if key not in got or key not in exp:
+                            problems.append(
+                                f"{child_name}/{qid}/{resolution}/{key}: "
+                                "bucket missing on one side"
+                            )
+                            continue
+                        for field in ("count", "sum", "min", "max"):
+                            if not math.isclose(
+                                got[key][field],
+                                exp[key][field],
+                                rel_tol=1e-9,
+                                abs_tol=1e-6,
+                            ):
+                                problems.append(
+                                    f"{child_name}/{qid}/{resolution}/{key}: "
+                                    f"{field} is {got[key][field]}, "
+                                    f"expected {exp[key][field]}"
+                                )
+        return problems
+
+    def choose_resolution(self, child_name, qids, width, start=None, end=None):
+        """The finest resolution at which every question fits in `width` pixels."""
+        child_rollups = self.get().get(child_name, {})
+        max_points = max(1, width // PIXELS_PER_POINT)
+        for resolution in RESOLUTIONS:
+            points = [
+                len(_in_range(child_rollups[qid][resolution], resolution, start, end))
+                for qid in qids if qid in child_rollups
+            ]
+            if max(points, default=0) <= max_points:
+                return resolution
+        return RESOLUTIONS[-1]
+
+    def data_version(self, child_name, qids, resolution, start=None, end=None):
+        """Short hash that changes with the buckets a chart of `qids` would plot."""
+        child_rollups = self.get().get(child_name, {})
+        return payload_version({
+            qid: _in_range(child_rollups[qid][resolution], resolution, start, end)
+            for qid in qids if qid in child_rollups
+        })
+
+    def series(self, child_name, qid, resolution, start=None, end=None):
+        """Bucket labels with mean/min/max/count for one question, oldest first."""
+        question = self.get().get(child_name, {}).get(qid)
+        buckets = (
+            _in_range(question[resolution], resolution, start, end) if question else []
+        )
+        return {
+            "dates": [key for key, _ in buckets],
+            "values": [
+                round(bucket["sum"] / bucket["count"], 3) for _, bucket in buckets
+            ],
+            "min": [bucket["min"] for _, bucket in buckets],
+            "max": [bucket["max"] for _, bucket in buckets],
+            "count": [bucket["count"] for _, bucket in buckets],
+        }
+
+
+if __name__ == "__main__":
+    # Cache maintenance:
+    #   python rollups.py verify   - compare the cache with the raw journal
+    #   python rollups.py repair   - rebuild the children it is behind on
+    #   python rollups.py rebuild  - recompute it from scratch
+    from app import journal, rollups
+
+    main(rollups, journal)
@@ -0,0 +1,410 @@
+import csv
+import os
+import sys
+from contextlib import ExitStack
+from urllib.parse import quote, unquote
+
+from config_store import ConfigStore
+from file_utils import JsonFile, file_lock
+from journal_store import LONG_HEADERS, JournalStore, QuestionCatalog, WideCsvMixin
+
+SHARD_PREFIX = "child="
+
+
+def shard_directory(directory, child_name):
+    """Directory holding a child's shard; the prefix keeps names like ".." harmless."""
+    return os.path.join(directory, SHARD_PREFIX + quote(child_name, safe=""))
+
+
+def shard_children(directory, filename):
+    """Children with a shard in `directory` that contains `filename`, sorted."""
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return []
+    return sorted(
+        unquote(entry.name[len(SHARD_PREFIX) :])
+        for entry in entries
+        if entry.name.startswith(SHARD_PREFIX)
+        and os.path.exists(os.path.join(entry.path, filename))
+    )
+
+
+class ShardedConfigStore:
+    """The child -> selected questions mapping, one questions.json per child shard.
+
+    Same interface as config_store.ConfigStore; changing one child's questions
+    never locks or rewrites another child's file.
+    """
+
+    FILENAME = "questions.json"
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._files = {}
+
+    def _file(self, child_name):
+        # Only files that exist are kept, so looking up made-up names (from URLs)
+        # cannot grow _files
+        if child_name in self._files:
+            return self._files[child_name]
+        path = os.path.join(shard_directory(self.directory, child_name), self.FILENAME)
+        file = JsonFile(path, default=list)
+        file.stage = "config_load"
+        if os.path.exists(path):
+            self._files[child_name] = file
+        return file
+
+    def get(self):
+        """Every child with its selected questions."""
+        return {
+            child_name: self.questions(child_name) for child_name in self.children()
+        }
+
+    def children(self):
+        """All child names, sorted."""
+        return shard_children(self.directory, self.FILENAME)
+
+    def questions(self, child_name):
+        """The questions selected for `child_name` (empty if unknown)."""
+        return self._file(child_name).get() if child_name else []
+
+    def add_child(self, child_name):
+        """Create the child's shard with no questions, if not already present."""
+        os.makedirs(shard_directory(self.directory, child_name), exist_ok=True)
+        self._file(child_name).update(lambda _questions: None)
+
+    def set_questions(self, child_name, questions):
+        """Replace the questions selected for `child_name`."""
+        def assign(selected):
+            selected[:] = list(questions)
+
+        os.makedirs(shard_directory(self.directory, child_name), exist_ok=True)
+        self._file(child_name).update(assign)
+
+
+class ShardedJournalStore(WideCsvMixin):
+    """The long-format journal split into one append-only file per child.
+
+    Each shard is a journal_store.JournalStore with its own index and lock,
+    so saves for different children never contend and a child's reads only
+    touch that child's file. The question catalog stays shared.
+    """
+
+    backend = "sharded"
+    FILENAME = "entries.csv"
+
+    def __init__(self, directory, catalog_path):
+        self.directory = directory
+        self.catalog = QuestionCatalog(catalog_path)
+        self._shards = {}
+
+    def shard(self, child_name):
+        """The JournalStore holding `child_name`'s entries.
+
+        Stores are kept for reuse (with their indexes) once the shard exists;
+        a child without one gets a fresh store each time, so looking up
+        made-up names cannot grow `_shards`.
+        """
+        if child_name in self._shards:
+            return self._shards[child_name]
+        path = os.path.join(shard_directory(self.directory, child_name), self.FILENAME)
+        store = JournalStore(path, self.catalog.path)
+        store.catalog = self.catalog
+        if os.path.exists(path):
+            self._shards[child_name] = store
+        return store
+
+    def children(self):
+        """Children that have a journal shard, sorted."""
+        return shard_children(self.directory, self.FILENAME)
+
+    def exists(self):
+        return bool(self.children())
+
+    def save(self, child_name, timestamp, values):
+        """Save one entry in the child's shard; returns what JournalStore.save does."""
+        return self.save_many([(child_name, timestamp, values)])[0]
+
+    def save_many(self, entries):
+        """Save entries with one locked append per child shard, in order."""
+        entries = list(entries)
+        by_child = {}
+        for position, entry in enumerate(entries):
+            by_child.setdefault(entry[0], []).append(position)
+        results = [None] * len(entries)
+        for child_name, positions in by_child.items():
+            os.makedirs(shard_directory(self.directory, child_name), exist_ok=True)
+            saved = self.shard(child_name).save_many(
+                [entries[position] for position in positions]
+            )
+            for position, result in zip(positions, saved, strict=True):
+                results[position] = result
+        return results
+
+    def save_counts(self):
+        """How many saves each child with entries has had: {child: count}."""
+        counts = {}
+        for child_name in self.children():
+            counts.update(self.shard(child_name).save_counts())
+        return counts
+
+    def iter_entries(self, saves=None):
+        """Yield (entry_id, timestamp, child_name, {question_id: value}) by shard."""
+        for child_name in self.children():
+            yield from self.shard(child_name).iter_entries(saves=saves)
+
+    def iter_child(self, child_name, start=None, end=None, saves=None):
+        """Yield one child's (timestamp, {question_id: value}) entries in time order."""
+        store = self.shard(child_name)
+        if not os.path.exists(store.path):
+            if saves is not None:
+                saves[child_name] = 0
+            return iter(())
+        return store.iter_child(child_name, start, end, saves)
+
+    def compact(self):
+        """Compact every shard."""
+        for child_name in self.children():
+            self.shard(child_name).compact()
+
+
+class ChildJournal:
+    """One child's entries in a combined journal, for its cache file to rebuild from."""
+
+    def __init__(self, journal, child_name):
+        self.journal = journal
+        self.child_name = child_name
+
+    def save_counts(self):
+        count = self.journal.save_counts().get(self.child_name)
+        return {self.child_name: count} if count else {}
+
+    def iter_entries(self, saves=None):
+        for timestamp, values in self.journal.iter_child(self.child_name, saves=saves):
+            yield None, timestamp, self.child_name, values
+
+    def iter_child(self, child_name, start=None, end=None, saves=None):
+        return self.journal.iter_child(child_name, start, end, saves)
+
+
+class ShardedCache:
+    """A running cache (aggregates, correlations, ...) kept as one file per child shard.
+
+    Wraps one of the JsonFile cache classes. Calls whose first argument is
+    a child name are routed to that child's file, so folding in a save only
+    rewrites the saving child's cache, however much data other children have.
+    Works over a sharded journal (each file follows its child's journal shard)
+    or a combined one (each file follows that child's entries in it).
+    """
+
+    def __init__(self, cache_class, directory, filename):
+        self.cache_class = cache_class
+        self.directory = directory
+        self.filename = filename
+        self._files = {}
+
+    def for_child(self, child_name):
+        # As with the journal shards, only caches whose file exists are kept for reuse
+        if child_name in self._files:
+            return self._files[child_name]
+        path = os.path.join(shard_directory(self.directory, child_name), self.filename)
+        cache = self.cache_class(path)
+        if os.path.exists(path):
+            self._files[child_name] = cache
+        return cache
+
+    def _writable(self, child_name):
+        """The child's cache, with its shard directory created for writing."""
+        cache = self.for_child(child_name)
+        os.makedirs(os.path.dirname(cache.path), exist_ok=True)
+        return cache
+
+    @staticmethod
+    def _journal_for(journal, child_name):
+        if isinstance(journal, ShardedJournalStore):
+            return journal.shard(child_name)
+        return ChildJournal(journal, child_name)
+
+    @staticmethod
+    def _journal_children(journal):
+        if isinstance(journal, ShardedJournalStore):
+            return journal.children()
+        return sorted(journal.save_counts())
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        # AttributeError for anything the cache class lacks
+        attribute = getattr(self.cache_class, name)
+        if not callable(attribute):
+            return attribute
+
+        def routed(child_name, *args, **kwargs):
+            return getattr(self.for_child(child_name), name)(
+                child_name, *args, **kwargs
+            )
+
+        return routed
+
+    def get(self):
+        """Every shard's cache merged into one {child: ...} mapping."""
+        merged = {}
+        for child_name in shard_children(self.directory, self.filename):
+            merged.update(self.for_child(child_name).get())
+        return merged
+
+    def record_many(self, saved, journal):
+        """Fold saves in like JournalCache.record_many, with one write per child."""
+        by_child = {}
+        for item in saved:
+            by_child.setdefault(item[0], []).append(item)
+        for child_name, items in by_child.items():
+            self._writable(child_name).record_many(
+                items, self._journal_for(journal, child_name)
+            )
+
+    def repair(self, journal):
+        """Rebuild the children whose cache is behind (or ahead of) their journal.
+
+        Returns their names.
+        """
+        repaired = []
+        children = set(self._journal_children(journal)) | set(
+            shard_children(self.directory, self.filename)
+        )
+        for child_name in sorted(children):
+            repaired += self._writable(child_name).repair(
+                self._journal_for(journal, child_name)
+            )
+        return repaired
+
+    def rebuild(self, journal, missing_only=False):
+        """Recompute each child's cache (only absent files if `missing_only`)."""
+        rebuilt = {}
+        for child_name in self._journal_children(journal):
+            cache = self._writable(child_name)
+            if missing_only and os.path.exists(cache.path):
+                continue
+            rebuilt.update(cache.rebuild(self._journal_for(journal, child_name)))
+        return rebuilt
+
+    def verify(self, journal):
+        """Compare every child's cache with a fresh build from its journal entries."""
+        problems = []
+        children = set(self._journal_children(journal)) | set(
+            shard_children(self.directory, self.filename)
+        )
+        for child_name in sorted(children):
+            problems += self.for_child(child_name).verify(
+                self._journal_for(journal, child_name)
+            )
+        return problems
+
+
+def split(directory, config, journal):
+    """Copy a combined config and long journal into per-child shards.
+
+    Returns the rows copied per child. Rows are copied verbatim (entry ids
+    and revisions included), so every shard holds exactly its child's
+    history. Refuses to overwrite shards that already have entries.
+    """
+    sharded_config = ShardedConfigStore(directory)
+    existing = set(shard_children(directory, ShardedJournalStore.FILENAME))
+    for child_name, questions in config.get().items():
+        sharded_config.set_questions(child_name, questions)
+
+    counts, writers = {}, {}
+    with (
+        ExitStack() as files,
+        file_lock(journal.path),
+        open(journal.path, newline="", encoding="utf-8") as source,
+    ):
+        reader = csv.reader(source)
+        next(reader, None)  # header
+        for row in reader:
+            child_name = row[3]
+            if child_name not in writers:
+                if child_name in existing:
+                    raise RuntimeError(
+                        f"Shard for {child_name!r} already has entries; remove it first"
+                    )
+                os.makedirs(shard_directory(directory, child_name), exist_ok=True)
+                path = os.path.join(
+                    shard_directory(directory, child_name), ShardedJournalStore.FILENAME
+                )
+                writers[child_name] = csv.writer(
+                    files.enter_context(open(path, "w", newline="", encoding="utf-8"))
+                )
+                writers[child_name].writerow(LONG_HEADERS)
+                counts[child_name] = 0
+            writers[child_name].writerow(row)
+            counts[child_name] += 1
+    return counts
+
+
+def merge(directory, config, journal_path):
+    """Copy per-child shards back into one combined config and long journal.
+
+    Returns the rows copied. The combined journal must not exist yet.
+    """
+    if os.path.exists(journal_path):
+        raise RuntimeError(f"{journal_path} already exists; move it aside first")
+    sharded_config = ShardedConfigStore(directory)
+    for child_name, questions in sharded_config.get().items():
+        config.set_questions(child_name, questions)
+
+    rows = 0
+    with open(journal_path, "w", newline="", encoding="utf-8") as target:
+        writer = csv.writer(target)
+        writer.writerow(LONG_HEADERS)
+        for child_name in shard_children(directory, ShardedJournalStore.FILENAME):
+            path = os.path.join(
+                shard_directory(directory, child_name), ShardedJournalStore.FILENAME
+            )
+            with file_lock(path), open(path, newline="", encoding="utf-8") as source:
+                reader = csv.reader(source)
+                next(reader, None)
+                for row in reader:
+                    writer.writerow(row)
+                    rows += 1
+    return rows
+
+
+if __name__ == "__main__":
+    # Move between the combined journal and per-child shards (stop the app first):
+    #   python shards.py split  - copy child_questions.json and the long journal into
+    #                             journal_shards/, then run the app with
+    #                             JOURNAL_BACKEND=sharded
+    #   python shards.py merge  - copy the shards back into the combined files
+    import app
+    from aggregates import AggregateCache
+    from correlations import CorrelationCache
+    from rollups import RollupCache
+    from trends import TrendCache
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    combined_config = ConfigStore(app.CHILD_QUESTIONS_FILE)
+    if command == "split":
+        combined = JournalStore(app.JOURNAL_FILE, app.QUESTION_CATALOG_FILE)
+        counts = split(app.SHARD_DIR, combined_config, combined)
+        sharded = ShardedJournalStore(app.SHARD_DIR, app.QUESTION_CATALOG_FILE)
+        for cache_class, filename in app.SHARD_CACHE_FILES:
+            ShardedCache(cache_class, app.SHARD_DIR, filename).rebuild(sharded)
+        for child_name, rows in sorted(counts.items()):
+            print(f"  {child_name}: {rows} rows")
+        print(
+            f"Split {sum(counts.values())} rows into {len(counts)} shards "
+            f"in {app.SHARD_DIR}"
+        )
+    elif command == "merge":
+        rows = merge(app.SHARD_DIR, combined_config, app.JOURNAL_FILE)
+        combined = JournalStore(app.JOURNAL_FILE, app.QUESTION_CATALOG_FILE)
+        AggregateCache(app.AGGREGATES_FILE).rebuild(combined)
+        CorrelationCache(app.CORRELATIONS_FILE).rebuild(combined)
+        ShardedCache(RollupCache, app.ROLLUPS_DIR, "rollups.json").rebuild(combined)
+        TrendCache(app.TRENDS_FILE).rebuild(combined)
+        print(f"Merged {rows} rows from {app.SHARD_DIR} into {app.JOURNAL_FILE}")
+    else:
+        print("Usage: python shards.py split | merge")
+        sys.exit(1)
@@ -0,0 +1,101 @@
+import io
+import os
+import shutil
+import sys
+from datetime import datetime
+from urllib.parse import quote
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Snapshots are optional
+    pa = pq = None
+
+from file_utils import JsonFile, file_lock, write_json_atomic
+from journal_loader import pivot_entries, read_long
+
+
+class JournalSnapshot:
+    """Child-partitioned Parquet snapshot of the journal, for analysis outside the app.
+
+    `build()` (a background job) writes one typed, wide Parquet file per child
+    and records the new version in the manifest. The app itself no longer
+    reads snapshots: the dashboards are served from the rollup and correlation
+    caches, which replaced the snapshot reader.
+    """
+
+    def __init__(self, directory, journal, registry):
+        self.directory = directory
+        self.journal = journal
+        self.registry = registry
+        self.manifest = JsonFile(os.path.join(directory, "manifest.json"))
+
+    def _partition_path(self, version, child_name):
+        return os.path.join(
+            self.directory,
+            version,
+            f"child={quote(child_name, safe='')}",
+            "part.parquet",
+        )
+
+    def build(self):
+        """Write a new journal snapshot and make it current; returns its version."""
+        if pq is None:
+            raise RuntimeError("pyarrow is required to write journal snapshots")
+        if self.journal.backend != "csv":
+            raise RuntimeError("Snapshots are only built for the CSV journal")
+
+        # Appends and compaction hold the lock, so the bytes read are whole batches
+        with file_lock(self.journal.path):
+            data = b""
+            if self.journal.exists():
+                with open(self.journal.path, "rb") as f:
+                    data = f.read()
+
+        version = datetime.now().strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+        os.makedirs(os.path.join(self.directory, version), exist_ok=True)
+        if data:
+            catalog = self.journal.catalog.get()
+            df = read_long(io.BytesIO(data))
+            for child_name, rows in df.groupby("Child Name", observed=True):
+                questions = [
+                    catalog[qid]
+                    for qid in rows["question_id"].unique()
+                    if qid in catalog
+                ]
+                entries = pivot_entries(rows, self.registry, questions).reset_index()
+                path = self._partition_path(version, child_name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                pq.write_table(
+                    pa.Table.from_pandas(entries, preserve_index=False), path
+                )
+
+        with file_lock(self.manifest.path):
+            write_json_atomic(self.manifest.path, {
+                "version": version,
+                "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            })
+
+        # Nothing reads older snapshots, so only the new one is kept
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isdir(path) and name != version:
+                shutil.rmtree(path, ignore_errors=True)
+        return version
+
+
+if __name__ == "__main__":
+    # Background compaction: drop superseded journal rows, then write a fresh snapshot.
+    #   python snapshots.py
+    from app import SNAPSHOT_DIR, journal, registry
+
+    snapshot = JournalSnapshot(SNAPSHOT_DIR, journal, registry)
+    journal.compact()
+    if pq is None or journal.backend != "csv":
+        print(
+            f"Compacted the {journal.backend} journal; snapshots need pyarrow and "
+            "the CSV journal, skipping."
+        )
+        sys.exit(0)
+    version = snapshot.build()
+    print(f"Wrote journal snapshot {version} to {snapshot.directory}")
@@ -0,0 +1,494 @@
+import csv
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from journal_store import WideCsvMixin
+from metrics import timed
+from questions import question_id
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS children (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    -- entries saved or revised, numbering each save for the caches
+    saves INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id TEXT PRIMARY KEY,  -- questions.question_id(text)
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS selections (
+    child_id INTEGER NOT NULL REFERENCES children(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    question_id TEXT NOT NULL REFERENCES questions(id),
+    PRIMARY KEY (child_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    child_id INTEGER NOT NULL REFERENCES children(id),
+    recorded_at TEXT NOT NULL,  -- "YYYY-MM-DD HH:MM:SS"
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS entries_child_date ON entries (child_id, recorded_at);
+CREATE TABLE IF NOT EXISTS answers (
+    entry_id INTEGER NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+    question_id TEXT NOT NULL REFERENCES questions(id),
+    value TEXT NOT NULL,
+    PRIMARY KEY (entry_id, question_id)
+) WITHOUT ROWID;
+"""
+
+
+class ConnectionPool:
+    """A bounded pool of SQLite connections in WAL mode, shared by a process's threads.
+
+    WAL lets readers run alongside the single writer; writes go through
+    `transaction()`, which takes the write lock up front (BEGIN IMMEDIATE) so
+    concurrent submits queue on the busy timeout instead of failing mid-way.
+    A thread waits at most `timeout` seconds for a free connection.
+    """
+
+    def __init__(self, path, size=4, timeout=30):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Durable at each checkpoint; safe with WAL
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection in autocommit mode."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()  # connections must not cross a fork (gunicorn workers)
+            create = self._idle.empty() and self._created < self.size
+            if create:
+                self._created += 1
+        try:
+            conn = self._connect() if create else self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError(
+                f"No database connection came free within {self.timeout}s; all "
+                f"{self.size} are in use"
+            ) from None
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def dedicated(self):
+        """A connection of its own, outside the pool, closed when done.
+
+        For reads that last as long as their caller iterates, such as a streamed
+        export, which would otherwise keep a pooled connection from every other
+        request.
+        """
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection inside a write transaction that commits on success."""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+
+def create_schema(pool):
+    """Create the tables and indexes if they are missing; upgrade older databases."""
+    with pool.connection() as conn:
+        conn.executescript(SCHEMA)
+    with pool.transaction() as conn:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(children)")]
+        if "saves" not in columns:
+            # Databases from before save numbering: every entry is one save plus
+            # one per revision
+            conn.execute(
+                "ALTER TABLE children ADD COLUMN saves INTEGER NOT NULL DEFAULT 0"
+            )
+            conn.execute(
+                "UPDATE children SET saves ="
+                " (SELECT COUNT(*) + COALESCE(SUM(revision), 0) FROM entries"
+                " WHERE child_id = children.id)"
+            )
+
+
+def _add_child(conn, child_name):
+    """Id of the named child, adding the child first if needed."""
+    conn.execute("INSERT OR IGNORE INTO children (name) VALUES (?)", (child_name,))
+    return _child_id(conn, child_name)
+
+
+def _child_id(conn, child_name):
+    """Id of an existing child; a name nobody added is refused rather than added."""
+    row = conn.execute(
+        "SELECT id FROM children WHERE name = ?", (child_name,)
+    ).fetchone()
+    if row is None:
+        raise ValueError(f"Unknown child {child_name!r}")
+    return row[0]
+
+
+class SqliteQuestionCatalog:
+    """question_id -> question text, in registration order, from the questions table."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def get(self):
+        """The whole catalog as {question_id: text}."""
+        with self.pool.connection() as conn:
+            return dict(conn.execute("SELECT id, text FROM questions ORDER BY rowid"))
+
+    def register(self, questions, conn=None):
+        """Add any unknown questions (in order) and return their ids."""
+        ids = [question_id(question) for question in questions]
+        rows = list(zip(ids, questions, strict=True))
+        if conn is not None:
+            conn.executemany(
+                "INSERT OR IGNORE INTO questions (id, text) VALUES (?, ?)", rows
+            )
+        else:
+            with self.pool.transaction() as conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO questions (id, text) VALUES (?, ?)", rows
+                )
+        return ids
+
+
+class SqliteConfigStore:
+    """The child -> selected questions mapping, in the children and selections tables.
+
+    Same interface as config_store.ConfigStore.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.catalog = SqliteQuestionCatalog(pool)
+
+    def get(self):
+        """Every child (in the order they were added) with its selected questions."""
+        with timed("config_load"), self.pool.connection() as conn:
+            config = {
+                name: []
+                for (name,) in conn.execute("SELECT name FROM children ORDER BY id")
+            }
+            rows = conn.execute(
+                "SELECT c.name, q.text FROM selections s"
+                " JOIN children c ON c.id = s.child_id"
+                " JOIN questions q ON q.id = s.question_id"
+                " ORDER BY s.child_id, s.position"
+            )
+            for child_name, question in rows:
+                config[child_name].append(question)
+        return config
+
+    def children(self):
+        """All child names, sorted."""
+        with self.pool.connection() as conn:
+            return [
+                name
+                for (name,) in conn.execute("SELECT name FROM children ORDER BY name")
+            ]
+
+    def questions(self, child_name):
+        """The questions selected for `child_name` (empty if unknown)."""
+        if not child_name:
+            return []
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT q.text FROM selections s"
+                " JOIN children c ON c.id = s.child_id"
+                " JOIN questions q ON q.id = s.question_id"
+                " WHERE c.name = ? ORDER BY s.position",
+                (child_name,),
+            )
+            return [text for (text,) in rows]
+
+    def add_child(self, child_name):
+        """Register a child with no questions, if not already present."""
+        with self.pool.transaction() as conn:
+            _add_child(conn, child_name)
+
+    def set_questions(self, child_name, questions):
+        """Replace the questions selected for `child_name`."""
+        questions = [question for question in questions if question.strip()]
+        with self.pool.transaction() as conn:
+            child_id = _add_child(conn, child_name)
+            ids = self.catalog.register(questions, conn=conn)
+            conn.execute("DELETE FROM selections WHERE child_id = ?", (child_id,))
+            conn.executemany(
+                "INSERT INTO selections (child_id, position, question_id)"
+                " VALUES (?, ?, ?)",
+                [(child_id, position, qid) for position, qid in enumerate(ids)],
+            )
+
+
+class SqliteJournalStore(WideCsvMixin):
+    """Journal entries in SQLite: one row per entry, one row per non-empty answer.
+
+    Same interface as journal_store.JournalStore. Saving an entry that already
+    exists for (child, timestamp) merges into it in one transaction, and every
+    per-child query is served by the (child_id, recorded_at) index. Each save
+    bumps the child's `saves` counter, which numbers the saves for the caches.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.path = pool.path
+        self.catalog = SqliteQuestionCatalog(pool)
+
+    def exists(self):
+        """Whether any entry has been saved yet."""
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT 1 FROM entries LIMIT 1").fetchone() is not None
+
+    def save(self, child_name, timestamp, values):
+        """Save an entry, merging it into an existing entry with the same key.
+
+        Returns (previous, current, sequence): the entry before and after as
+        {question_id: value} dicts, with previous None for a new entry, and
+        the child's save number.
+        """
+        return self.save_many([(child_name, timestamp, values)])[0]
+
+    def save_many(self, entries):
+        """Save `(child_name, timestamp, values)` entries in one transaction.
+
+        Returns one (previous, current, sequence) per entry.
+        """
+        entries = list(entries)
+        texts = list(
+            dict.fromkeys(question for _, _, values in entries for question in values)
+        )
+        with self.pool.transaction() as conn:
+            ids = dict(zip(texts, self.catalog.register(texts, conn=conn), strict=True))
+            return [self._save(conn, ids, *entry) for entry in entries]
+
+    def _save(self, conn, ids, child_name, timestamp, values):
+        child_id = _child_id(conn, child_name)
+        row = conn.execute(
+            "SELECT id FROM entries WHERE child_id = ? AND recorded_at = ?",
+            (child_id, timestamp),
+        ).fetchone()
+        merged, previous = {}, None
+        if row:
+            entry_id = row[0]
+            previous = dict(
+                conn.execute(
+                    "SELECT question_id, value FROM answers WHERE entry_id = ?",
+                    (entry_id,),
+                )
+            )
+            merged.update(previous)
+            conn.execute(
+                "UPDATE entries SET revision = revision + 1 WHERE id = ?", (entry_id,)
+            )
+            conn.execute("DELETE FROM answers WHERE entry_id = ?", (entry_id,))
+        else:
+            entry_id = conn.execute(
+                "INSERT INTO entries (child_id, recorded_at) VALUES (?, ?)",
+                (child_id, timestamp),
+            ).lastrowid
+        for question, value in values.items():
+            merged[ids[question]] = "" if value is None else value
+
+        current = {qid: value for qid, value in merged.items() if value != ""}
+        conn.executemany(
+            "INSERT INTO answers (entry_id, question_id, value) VALUES (?, ?, ?)",
+            [(entry_id, qid, value) for qid, value in current.items()],
+        )
+        (sequence,) = conn.execute(
+            "UPDATE children SET saves = saves + 1 WHERE id = ? RETURNING saves",
+            (child_id,),
+        ).fetchone()
+        return previous, current, sequence
+
+    def import_wide(self, path):
+        """One-off migration of a legacy wide CSV; its children are added first."""
+        with open(path, mode="r", newline="") as file:
+            children = {row["Child Name"] for row in csv.DictReader(file)}
+        with self.pool.transaction() as conn:
+            for child_name in children:
+                _add_child(conn, child_name)
+        super().import_wide(path)
+
+    def save_counts(self):
+        """How many saves each child with entries has had: {child: count}."""
+        with self.pool.connection() as conn:
+            return dict(
+                conn.execute("SELECT name, saves FROM children WHERE saves > 0")
+            )
+
+    @contextmanager
+    def _snapshot(self):
+        """A connection in a read transaction, so several queries see the same state.
+
+        The readers are generators that keep the transaction open while the
+        caller iterates, so they use a dedicated connection, not a pooled one.
+        """
+        with self.pool.dedicated() as conn:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            finally:
+                conn.execute("COMMIT")
+
+    def iter_entries(self, saves=None):
+        """Yield (entry_id, timestamp, child_name, {question_id: value}) per entry.
+
+        A `saves` dict is given every child's save count as of the entries
+        yielded.
+        """
+        with self._snapshot() as conn:
+            if saves is not None:
+                saves.update(
+                    conn.execute("SELECT name, saves FROM children WHERE saves > 0")
+                )
+            rows = conn.execute(
+                "SELECT e.id, e.recorded_at, c.name, a.question_id, a.value"
+                " FROM entries e JOIN children c ON c.id = e.child_id"
+                " LEFT JOIN answers a ON a.entry_id = e.id"
+                " ORDER BY e.id"
+            )
+            current, values = None, {}
+            for entry_id, timestamp, child_name, qid, value in rows:
+                if current is not None and current[0] != entry_id:
+                    yield str(current[0]), current[1], current[2], values
+                    values = {}
+                current = (entry_id, timestamp, child_name)
+                if qid is not None:
+                    values[qid] = value
+            if current is not None:
+                yield str(current[0]), current[1], current[2], values
+
+    def iter_child(self, child_name, start=None, end=None, saves=None):
+        """Yield one child's (timestamp, {question_id: value}) entries in time order.
+
+        `start` and `end` are inclusive "YYYY-MM-DD" dates; the range is an
+        index scan on (child_id, recorded_at). A `saves` dict is given the
+        child's save count as of the entries yielded.
+        """
+        sql = (
+            "SELECT e.recorded_at, a.question_id, a.value FROM entries e"
+            " JOIN children c ON c.id = e.child_id"
+            " LEFT JOIN answers a ON a.entry_id = e.id"
+            " WHERE c.name = ? AND e.recorded_at >= ? AND e.recorded_at < ?"
+            " ORDER BY e.recorded_at"
+        )
+        # Every stored timestamp sorts after a bare date and before "<date>~"
+        params = (child_name, start or "", f"{end}~" if end else "~")
+        with self._snapshot() as conn:
+            if saves is not None:
+                row = conn.execute(
+                    "SELECT saves FROM children WHERE name = ?", (child_name,)
+                ).fetchone()
+                saves[child_name] = row[0] if row else 0
+            current, values = None, {}
+            for timestamp, qid, value in conn.execute(sql, params):
+                if current is not None and timestamp != current:
+                    yield current, values
+                    values = {}
+                current = timestamp
+                if qid is not None:
+                    values[qid] = value
+            if current is not None:
+                yield current, values
+
+    def compact(self):
+        """Fold the write-ahead log back into the database (for a background job)."""
+        with self.pool.connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def migrate(pool, config, journal, wide_csv=None):
+    """One-shot import of the JSON config and the file journal into the database.
+
+    Returns the entry count. If the long-format journal was never created,
+    the legacy wide CSV is imported instead.
+    """
+    create_schema(pool)
+    db_config, store = SqliteConfigStore(pool), SqliteJournalStore(pool)
+    for child_name in config.get():
+        db_config.add_child(child_name)
+    # Children with entries but no longer in the config
+    for child_name in journal.save_counts():
+        db_config.add_child(child_name)
+
+    # Questions go in journal order first, so exported columns keep their order
+    if not journal.exists() and wide_csv and os.path.exists(wide_csv):
+        store.import_wide(wide_csv)
+    else:
+        catalog = journal.catalog.get()
+        store.catalog.register(list(catalog.values()))
+        for _, timestamp, child_name, values in journal.iter_entries():
+            store.save(
+                child_name,
+                timestamp,
+                {catalog[qid]: value for qid, value in values.items()},
+            )
+
+    for child_name, questions in config.get().items():
+        db_config.set_questions(child_name, questions)
+    return sum(1 for _ in store.iter_entries())
+
+
+if __name__ == "__main__":
+    # Moving between the file backend and SQLite:
+    #   python sqlite_store.py migrate  - import child_questions.json and the journal
+    #                                     files into DATABASE_FILE
+    #   python sqlite_store.py export   - write child_questions.json and the wide CSV
+    #                                     back out of DATABASE_FILE
+    import app
+    from config_store import ConfigStore
+    from file_utils import write_json_atomic
+    from journal_store import JournalStore
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    pool = ConnectionPool(app.DATABASE_FILE)
+    if command == "migrate":
+        config = ConfigStore(app.CHILD_QUESTIONS_FILE)
+        journal = JournalStore(app.JOURNAL_FILE, app.QUESTION_CATALOG_FILE)
+        count = migrate(pool, config, journal, wide_csv=app.CSV_FILE)
+        print(f"Imported {count} entries into {app.DATABASE_FILE}")
+    elif command == "export":
+        write_json_atomic(app.CHILD_QUESTIONS_FILE, SqliteConfigStore(pool).get())
+        with open(app.CSV_FILE, mode="w", newline="") as file:
+            SqliteJournalStore(pool).export_wide(file)
+        print(
+            f"Exported {app.DATABASE_FILE} to {app.CHILD_QUESTIONS_FILE} "
+            f"and {app.CSV_FILE}"
+        )
+    else:
+        print("Usage: python sqlite_store.py migrate | export")
+        sys.exit(1)
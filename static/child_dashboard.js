@@ -0,0 +1,153 @@
+// Draws the child dashboard from the series API: one SVG line chart per
+// question (bucket averages with their min-max band) and the correlation
+// heat map as a table.
+(function () {
+    var SVG_NS = "http://www.w3.org/2000/svg";
+    var container = document.getElementById("charts");
+    var status = document.getElementById("charts-status");
+
+    function svg(name, attrs, parent) {
+        var node = document.createElementNS(SVG_NS, name);
+        Object.keys(attrs).forEach(function (key) { node.setAttribute(key, attrs[key]); });
+        if (parent) parent.appendChild(node);
+        return node;
+    }
+
+    function html(name, text, parent) {
+        var node = document.createElement(name);
+        if (text !== undefined) node.textContent = text;
+        if (parent) parent.appendChild(node);
+        return node;
+    }
+
+    function formatNumber(value) {
+        return Math.round(value * 100) / 100;
+    }
+
+    function lineChart(series) {
+        var width = 800, height = 400;
+        var left = 50, right = 20, top = 20, bottom = 80;
+        var values = series.values, n = values.length;
+        var min = Math.min.apply(null, series.min), max = Math.max.apply(null, series.max);
+        if (min === max) { min -= 1; max += 1; }
+
+        function x(i) { return left + (n > 1 ? i / (n - 1) : 0.5) * (width - left - right); }
+        function y(v) { return height - bottom - (v - min) / (max - min) * (height - top - bottom); }
+
+        var chart = svg("svg", {viewBox: "0 0 " + width + " " + height, width: width, role: "img"});
+        svg("line", {"class": "axis", x1: left, y1: height - bottom, x2: width - right, y2: height - bottom}, chart);
+        svg("line", {"class": "axis", x1: left, y1: top, x2: left, y2: height - bottom}, chart);
+
+        // Y axis: min, middle and max
+        [min, (min + max) / 2, max].forEach(function (v) {
+            svg("text", {x: left - 6, y: y(v) + 4, "text-anchor": "end"}, chart).textContent = formatNumber(v);
+        });
+
+        // Limit x-axis labels to reduce overcrowding
+        var step = Math.max(1, Math.floor(n / 10));
+        for (var i = 0; i < n; i += step) {
+            var label = svg("text", {
+                x: x(i), y: height - bottom + 14, "text-anchor": "end",
+                transform: "rotate(-45 " + x(i) + " " + (height - bottom + 14) + ")"
+            }, chart);
+            label.textContent = series.dates[i];
+        }
+
+        // Shaded band from each bucket's lowest to highest answer
+        var band = series.max.map(function (v, i) { return x(i) + "," + y(v); })
+            .concat(series.min.map(function (v, i) { return x(i) + "," + y(v); }).reverse());
+        svg("polygon", {"class": "range", points: band.join(" ")}, chart);
+
+        svg("polyline", {
+            "class": "line",
+            points: values.map(function (v, i) { return x(i) + "," + y(v); }).join(" ")
+        }, chart);
+        values.forEach(function (v, i) {
+            var point = svg("circle", {"class": "point", cx: x(i), cy: y(v), r: 3}, chart);
+            svg("title", {}, point).textContent = series.dates[i] + ": " + formatNumber(v) +
+                " (" + series.count[i] + " answers, " + formatNumber(series.min[i]) + "-" + formatNumber(series.max[i]) + ")";
+        });
+        return chart;
+    }
+
+    // Blue for negative, red for positive, fading to white at zero
+    function heatColor(value) {
+        var base = value < 0 ? [59, 76, 192] : [180, 4, 38];
+        var t = Math.min(1, Math.abs(value));
+        return "rgb(" + base.map(function (c) { return Math.round(255 + (c - 255) * t); }).join(",") + ")";
+    }
+
+    function shortLabel(label) {
+        return label.length > 15 ? label.slice(0, 15) + "..." : label;
+    }
+
+    function heatmap(correlations) {
+        var table = html("table");
+        table.className = "heatmap";
+        var header = html("tr", undefined, html("thead", undefined, table));
+        html("th", "", header);
+        correlations.labels.forEach(function (label) {
+            html("th", shortLabel(label), header).title = label;
+        });
+        var body = html("tbody", undefined, table);
+        correlations.matrix.forEach(function (row, r) {
+            var tr = html("tr", undefined, body);
+            html("th", shortLabel(correlations.labels[r]), tr).title = correlations.labels[r];
+            row.forEach(function (value) {
+                var cell = html("td", value === null ? "" : value.toFixed(2), tr);
+                if (value !== null) {
+                    cell.style.backgroundColor = heatColor(value);
+                    if (Math.abs(value) > 0.6) cell.style.color = "#fff";
+                }
+            });
+        });
+        return table;
+    }
+
+    function render(data) {
+        container.removeChild(status);
+        if (data.updated_at) {
+            var note = html("p", "Data as of " + data.updated_at +
+                (data.pending ? " (recent entries are still being added)." : "."), container);
+            note.className = "freshness";
+        }
+        if (!data.series.length) {
+            html("p", "No data available to display.", container);
+            return;
+        }
+        data.series.forEach(function (series) {
+            var block = html("div", undefined, container);
+            block.className = "chart";
+            html("h3", series.question, block);
+            if (!series.values.length) {
+                html("p", "No answers in this date range.", block);
+                return;
+            }
+            block.appendChild(lineChart(series));
+        });
+        if (data.correlations && data.correlations.labels.length) {
+            html("h2", "Correlation Heatmap", container);
+            container.appendChild(heatmap(data.correlations));
+        }
+    }
+
+    // The server picks the rollup resolution from the width the charts will be drawn at
+    var url = container.getAttribute("data-series-url");
+    url += (url.indexOf("?") < 0 ? "?" : "&") + "width=" + Math.round(container.clientWidth || 800);
+
+    // The browser revalidates with the ETag, so unchanged data comes back as an empty 304
+    fetch(url, {headers: {Accept: "application/json"}})
+        .then(function (response) {
+            if (!response.ok) throw new Error("HTTP " + response.status);
+            return response.json();
+        })
+        .then(render)
+        .catch(function (error) {
+            status.innerHTML = "";
+            status.appendChild(document.createTextNode("Could not load charts (" + error.message + "). "));
+            var link = html("a", "View them as images instead.", status);
+            var params = new URLSearchParams(window.location.search);
+            params.set("render", "png");
+            link.href = "?" + params.toString();
+        });
+})();
@@ -0,0 +1,224 @@
+import argparse
+import math
+import random
+from datetime import date, datetime, timedelta
+
+from questions import (
+    BINARY,
+    COUNT,
+    HOURS,
+    MINUTES,
+    PREDEFINED_QUESTIONS,
+    SCALE,
+    TIME_OF_DAY,
+    QuestionRegistry,
+)
+
+# Entries saved per journal write while populating
+BATCH_SIZE = 2000
+
+# Share of answers left blank, as parents skip questions
+BLANK_RATE = 0.05
+
+FREE_TEXT_ANSWERS = [
+    "Quiet day at home",
+    "Trouble at school, lots of crying",
+    "Good morning, rough evening",
+    "Loved the park",
+    "Refused dinner",
+    "Slept through the night!",
+    "New therapist visit went well",
+    "Overwhelmed at the grocery store",
+]
+
+
+def _poisson(rng, mean):
+    """Knuth's method; fine for the small daily counts used here."""
+    limit, k, p = math.exp(-mean), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+
+def _profile(rng, question):
+    """Per-child parameters for one question.
+
+    Its typical level, and how much it follows the child's bad days.
+    """
+    response_type = question.response_type
+    text = question.text.lower()
+    if response_type == BINARY:
+        level = rng.uniform(0.2, 0.8)
+    elif response_type == SCALE:
+        level = rng.uniform(1.8, 4.2)
+    elif response_type == COUNT:
+        level = rng.uniform(0.5, 6.0)
+    elif response_type == MINUTES:
+        level = rng.uniform(10, 120)
+    elif response_type == HOURS:
+        level = rng.uniform(7.5, 10.5)
+    elif response_type == TIME_OF_DAY:
+        # Minutes after midnight: bedtimes in the evening, everything else
+        # in the morning
+        level = (
+            rng.uniform(19 * 60, 21 * 60)
+            if "asleep" in text
+            else rng.uniform(6 * 60, 8 * 60)
+        )
+    else:
+        level = 0.0
+    return {
+        "level": level,
+        "loading": rng.uniform(-0.6, 0.6),
+        "drift": rng.uniform(-0.3, 0.3),
+    }
+
+
+def _answer(rng, question, profile, mood, progress, weekend):
+    """One answer of the question's response type, as QuestionRegistry.parse returns."""
+    response_type = question.response_type
+    # Shared daily "mood" makes a child's questions move together; drift adds
+    # a slow trend
+    shift = profile["loading"] * mood + profile["drift"] * progress
+    level = profile["level"]
+    if response_type == BINARY:
+        return int(rng.random() < min(0.95, max(0.05, level + 0.15 * shift)))
+    if response_type == SCALE:
+        return min(
+            5, max(1, round(rng.gauss(level + shift + (0.3 if weekend else 0.0), 0.7)))
+        )
+    if response_type == COUNT:
+        return _poisson(rng, max(0.05, level * math.exp(0.4 * shift)))
+    if response_type == MINUTES:
+        return int(rng.gammavariate(2.0, max(1.0, level * math.exp(0.3 * shift)) / 2.0))
+    if response_type == HOURS:
+        return round(min(14.0, max(3.0, rng.gauss(level - 0.4 * shift, 0.6))), 1)
+    if response_type == TIME_OF_DAY:
+        minutes = int(rng.gauss(level + 20 * shift + (45 if weekend else 0), 20))
+        minutes %= 24 * 60
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+    return rng.choice(FREE_TEXT_ANSWERS)
+
+
+def choose_questions(rng, count):
+    """`count` predefined questions spread over every category.
+
+    The list cycles if more are asked for.
+    """
+    by_category = [list(questions) for questions in PREDEFINED_QUESTIONS.values()]
+    for questions in by_category:
+        rng.shuffle(questions)
+    interleaved = [
+        questions[i]
+        for i in range(max(map(len, by_category)))
+        for questions in by_category
+        if i < len(questions)
+    ]
+    return interleaved[:count]
+
+
+def generate(
+    num_children,
+    days,
+    questions_per_child,
+    seed=0,
+    start=date(2022, 1, 1),
+    registry=None,
+):
+    """Return ({child: questions}, entries) for a synthetic journal.
+
+    `entries` lazily yields one (child_name, timestamp, {question: value})
+    evening entry per child per day, oldest first, with answers typed by each
+    question's response type.
+    """
+    registry = registry or QuestionRegistry()
+    rng = random.Random(seed)
+    selections = {
+        f"Child {i + 1}": choose_questions(rng, questions_per_child)
+        for i in range(num_children)
+    }
+    profiles = {
+        child: {
+            question: _profile(rng, registry.get(question)) for question in questions
+        }
+        for child, questions in selections.items()
+    }
+
+    def entries():
+        for day in range(days):
+            current = start + timedelta(days=day)
+            weekend = current.weekday() >= 5
+            progress = day / max(1, days - 1)
+            for child, questions in selections.items():
+                mood = rng.gauss(0, 1)
+                moment = datetime.combine(current, datetime.min.time()) + timedelta(
+                    minutes=rng.randint(18 * 60, 22 * 60)
+                )
+                values = {
+                    question: _answer(
+                        rng,
+                        registry.get(question),
+                        profiles[child][question],
+                        mood,
+                        progress,
+                        weekend,
+                    )
+                    for question in questions
+                    if rng.random() >= BLANK_RATE
+                }
+                yield child, moment.strftime("%Y-%m-%d %H:%M:%S"), values
+
+    return selections, entries()
+
+
+def populate(config, journal, selections, entries, batch_size=BATCH_SIZE):
+    """Register the children and their questions, then save `entries` in batches.
+
+    Returns the answer count.
+    """
+    for child, questions in selections.items():
+        config.add_child(child)
+        config.set_questions(child, questions)
+    journal.catalog.register(
+        [question for questions in selections.values() for question in questions]
+    )
+
+    answers, batch = 0, []
+    for entry in entries:
+        batch.append(entry)
+        answers += len(entry[2])
+        if len(batch) >= batch_size:
+            journal.save_many(batch)
+            batch = []
+    if batch:
+        journal.save_many(batch)
+    return answers
+
+
+if __name__ == "__main__":
+    # Fill the app's journal (in the current directory) with synthetic entries:
+    #   python synthetic.py --children 10 --days 365 --questions 12 [--seed N]
+    parser = argparse.ArgumentParser(description="Generate a synthetic child journal.")
+    parser.add_argument("--children", type=int, default=4)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument(
+        "--questions", type=int, default=12, help="questions selected per child"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from app import aggregates, config, correlations, journal, rollups, trends
+
+    selections, entries = generate(
+        args.children, args.days, args.questions, seed=args.seed
+    )
+    answers = populate(config, journal, selections, entries)
+    # One rebuild per cache is far cheaper than folding every batch in as it is saved
+    for cache in (aggregates, correlations, rollups, trends):
+        cache.rebuild(journal)
+    print(
+        f"Wrote {args.children * args.days} entries ({answers} answers) "
+        f"for {args.children} children."
+    )
@@ -0,0 +1,219 @@
+import math
+import statistics
+from datetime import date, timedelta
+
+from aggregates import to_number
+from journal_cache import JournalCache, main
+
+# Days of daily means kept per question; a 30-day EWMA has lost all but 0.3% of its
+# weight by then
+WINDOW_DAYS = 90
+
+# Spans of the short and long exponentially weighted means, in observed days
+SHORT_SPAN = 7
+LONG_SPAN = 30
+
+# The latest day is compared with the days before it within this many calendar days
+ROLLING_DAYS = 30
+
+# Fewer earlier days than this and the z-score is left undefined
+MIN_BASELINE_DAYS = 7
+
+# |z| at which the overview flags the latest answer as unusual
+Z_THRESHOLD = 2.0
+
+
+def _ewma(means, span):
+    """Exponentially weighted mean of the daily means, oldest first.
+
+    The smoothing factor is alpha = 2 / (span + 1).
+    """
+    alpha = 2 / (span + 1)
+    average = None
+    for value in means:
+        average = value if average is None else average + alpha * (value - average)
+    return average
+
+
+def _summarize(days):
+    """Trend numbers for one question from its {day: [sum, count]} window."""
+    ordered = sorted(days.items())
+    means = [total / count for _, (total, count) in ordered]
+    latest_day, latest = ordered[-1][0], means[-1]
+
+    # Daily means in the rolling window ending on (and including) the latest day
+    since = (
+        date.fromisoformat(latest_day) - timedelta(days=ROLLING_DAYS - 1)
+    ).isoformat()
+    recent = [
+        mean for (day, _), mean in zip(ordered, means, strict=True) if day >= since
+    ]
+    baseline = recent[:-1]
+
+    z = baseline_mean = None
+    if len(baseline) >= MIN_BASELINE_DAYS:
+        baseline_mean = statistics.fmean(baseline)
+        spread = statistics.stdev(baseline)
+        # A question always answered the same way has no usual spread to deviate from
+        if spread > 0:
+            z = (latest - baseline_mean) / spread
+    return {
+        "latest_day": latest_day,
+        "latest": latest,
+        "ewma_short": _ewma(means, SHORT_SPAN),
+        "ewma_long": _ewma(means, LONG_SPAN),
+        "rolling_variance": statistics.variance(recent) if len(recent) > 1 else None,
+        "baseline": baseline_mean,
+        "z": z,
+    }
+
+
+def _window_start(newest):
+    """First day kept in a window ending on `newest`."""
+    return (date.fromisoformat(newest) - timedelta(days=WINDOW_DAYS - 1)).isoformat()
+
+
+def _apply(child_trends, day, values, sign):
+    """Add (sign=1) or retract (sign=-1) an entry; returns the qids touched."""
+    touched = set()
+    for qid, value in values.items():
+        number = to_number(value)
+        if number is None:
+            continue
+        question = child_trends.get(qid)
+        if question is not None and day < question["window_start"]:
+            continue  # older than the window; it no longer moves the trend
+        if sign > 0:
+            question = child_trends.setdefault(
+                qid, {"window_start": _window_start(day), "days": {}}
+            )
+            daily = question["days"].setdefault(day, [0.0, 0])
+        elif question is None or day not in question["days"]:
+            continue
+        else:
+            daily = question["days"][day]
+        daily[0] += sign * number
+        daily[1] += sign
+        if not daily[1]:
+            del question["days"][day]
+        touched.add(qid)
+    return touched
+
+
+def _record(cache, child_name, timestamp, previous, current, summarize=True):
+    child_trends = cache.setdefault(child_name, {})
+    day = timestamp[:10]  # "YYYY-MM-DD"
+    touched = set()
+    if previous:
+        touched |= _apply(child_trends, day, previous, -1)
+    touched |= _apply(child_trends, day, current, 1)
+
+    # Only the touched questions are re-summarized, each over at most
+    # WINDOW_DAYS daily means
+    for qid in touched:
+        question = child_trends[qid]
+        if not question["days"]:
+            del child_trends[qid]
+            continue
+        # The window only moves forward, so the kept days do not depend on the order
+        # entries arrived in
+        window_start = _window_start(max(question["days"]))
+        if window_start > question["window_start"]:
+            question["window_start"] = window_start
+            for old_day in [d for d in question["days"] if d < window_start]:
+                del question["days"][old_day]
+        if summarize:
+            question["stats"] = _summarize(question["days"])
+    if not child_trends:
+        del cache[child_name]
+
+
+class TrendCache(JournalCache):
+    """Rolling trend and anomaly numbers per child and question.
+
+    Keeps the last WINDOW_DAYS daily means of each question with their short
+    and long EWMAs, rolling variance and the z-score of the latest day against
+    the days before it. A save only re-summarizes the questions it answered,
+    over a bounded window, so its cost does not grow with the child's history.
+    """
+
+    name = "trend cache"
+
+    def fold(self, cache, child_name, timestamp, previous, current):
+        _record(cache, child_name, timestamp, previous, current)
+
+    def build(self, entries):
+        # Each question is summarized once at the end rather than after every entry
+        cache = {}
+        for child_name, timestamp, values in entries:
+            _record(cache, child_name, timestamp, None, values, summarize=False)
+        for child_trends in cache.values():
+            for question in child_trends.values():
+                question["stats"] = _summarize(question["days"])
+        return cache
+
+    def diff(self, cached, expected):
+        problems = []
+        for child_name in sorted(set(cached) | set(expected)):
+            have, want = cached.get(child_name, {}), expected.get(child_name, {})
+            for qid in sorted(set(have) | set(want)):
+                if qid not in have or qid not in want:
+                    problems.append(f"{child_name}/{qid}: question missing on one side")
+                    continue
+                got, exp = have[qid]["stats"], want[qid]["stats"]
+                for field in sorted(exp):
+                    if field == "latest_day":
+                        if got[field] != exp[field]:
+                            problems.append(
+                                f"{child_name}/{qid}: latest_day is {got[field]}, "
+                                f"expected {exp[field]}"
+                            )
+                    elif not _close(got[field], exp[field]):
+                        problems.append(
+                            f"{child_name}/{qid}: {field} is {got[field]}, "
+                            f"expected {exp[field]}"
+                        )
+        return problems
+
+    def stats(self, child_name, qid):
+        """The trend numbers for one question, or None if it has no numeric answers."""
+        question = self.get().get(child_name, {}).get(qid)
+        return question["stats"] if question else None
+
+    def flags(self, child_name, catalog, registry, threshold=Z_THRESHOLD):
+        """Questions whose latest answer is `threshold` or more deviations from usual.
+
+        Only numeric questions are flagged, and the largest deviations come first.
+        """
+        flagged = []
+        for qid, question in self.get().get(child_name, {}).items():
+            if qid in catalog and not registry.get(catalog[qid]).is_numeric:
+                continue
+            stats = question["stats"]
+            if stats["z"] is None or abs(stats["z"]) < threshold:
+                continue
+            flagged.append({
+                "question": catalog.get(qid, qid),
+                "day": stats["latest_day"],
+                "latest": round(stats["latest"], 2),
+                "usual": round(stats["baseline"], 2),
+                "z": round(stats["z"], 1),
+                "direction": "higher" if stats["z"] > 0 else "lower",
+            })
+        return sorted(flagged, key=lambda flag: -abs(flag["z"]))
+
+
+def _close(a, b):
+    if a is None or b is None:
+        return a is b
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+
+
+if __name__ == "__main__":
+    # Cache maintenance:
+    #   python trends.py verify   - compare the cache with the raw journal
+    #   python trends.py repair   - rebuild the children it is behind on
+    #   python trends.py rebuild  - recompute it from scratch
+    from app import journal, trends
+
+    main(trends, journal)